@@ -1,22 +1,53 @@
 import os, json
+import time
+import random
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, Iterator, List, Sequence
 import boto3
 from botocore.config import Config
+from botocore.exceptions import ClientError, ConnectionError as BotoConnectionError, ReadTimeoutError
+from app.ai import llm_cache
+from app.ai.rate_limit import limiter
+
+logger = logging.getLogger(__name__)
 
 REGION = os.getenv("AWS_REGION", "us-east-1")
 MODEL_ID = os.getenv("BEDROCK_MODEL_ID", "anthropic.claude-3-5-sonnet-20240620")
+# Сколько вызовов Bedrock одновременно на процесс (общий лимит для всех запросов)
+MAX_CONCURRENCY = int(os.getenv("BEDROCK_MAX_CONCURRENCY", "4"))
+# Повторы делаем сами (через limiter и без блокировки потока в achat), а не внутри boto3
+MAX_RETRIES = int(os.getenv("BEDROCK_MAX_RETRIES", "4"))
+BACKOFF_BASE = float(os.getenv("BEDROCK_BACKOFF_BASE", "1"))   # сек, удваивается с каждой попыткой
+BACKOFF_MAX = float(os.getenv("BEDROCK_BACKOFF_MAX", "30"))
+# Другой адрес Bedrock runtime, например локальная заглушка bedrock_stub.py для нагрузочных тестов
+ENDPOINT_URL = os.getenv("BEDROCK_ENDPOINT_URL") or None
+
+_RETRYABLE_CODES = {
+    "ThrottlingException", "ServiceUnavailableException", "ModelNotReadyException",
+    "InternalServerException", "ModelTimeoutException",
+}
+
+_inflight = threading.BoundedSemaphore(MAX_CONCURRENCY)
+
+# Стримы (astream_chat) живут, пока клиент читает ответ, поэтому у них свой лимит,
+# а события читают потоки отдельного пула: стримы не занимают пул по умолчанию
+# (asyncio.to_thread в achat/llm_cache). Слот берётся и отдаётся в event loop.
+MAX_STREAMS = int(os.getenv("BEDROCK_MAX_STREAMS", str(MAX_CONCURRENCY)))
+_stream_slots = asyncio.Semaphore(MAX_STREAMS)
+_stream_executor = ThreadPoolExecutor(max_workers=MAX_STREAMS, thread_name_prefix="bedrock-stream")
 
 _bedrock = boto3.client(
     "bedrock-runtime",
     region_name=REGION,
-    config=Config(retries={"max_attempts": 3, "mode": "standard"}),
+    endpoint_url=ENDPOINT_URL,
+    config=Config(retries={"total_max_attempts": 1, "mode": "standard"}),
 )
 
-def chat(prompt: str, max_tokens: int = 512, temperature: float = 0.2) -> str:
-    """
-    Send a simple chat prompt to Anthropic Claude on Amazon Bedrock and return the text reply.
-    Requires AWS credentials to be configured in the environment/credentials file.
-    """
-    body = {
+def _request_body(prompt: str, max_tokens: int, temperature: float) -> Dict[str, Any]:
+    return {
         "anthropic_version": "bedrock-2023-05-31",
         "max_tokens": max_tokens,
         "temperature": temperature,
@@ -24,11 +55,224 @@ def chat(prompt: str, max_tokens: int = 512, temperature: float = 0.2) -> str:
             {"role": "user", "content": [{"type": "text", "text": prompt}]}
         ],
     }
-    resp = _bedrock.invoke_model(
+
+def _estimate_tokens(prompt: str, max_tokens: int) -> int:
+    # ~4 символа на токен для входа плюс максимум выхода; уточняется по usage из ответа
+    return len(prompt) // 4 + max_tokens
+
+def _invoke(body: Dict[str, Any]) -> Dict[str, Any]:
+    with _inflight:
+        resp = _bedrock.invoke_model(
+            modelId=MODEL_ID,
+            contentType="application/json",
+            accept="application/json",
+            body=json.dumps(body),
+        )
+        return json.loads(resp["body"].read())
+
+def _error_code(e: Exception) -> str | None:
+    if isinstance(e, ClientError):
+        return e.response.get("Error", {}).get("Code")
+    return None
+
+def _is_retryable(e: Exception) -> bool:
+    return _error_code(e) in _RETRYABLE_CODES or isinstance(e, (BotoConnectionError, ReadTimeoutError))
+
+def _backoff(attempt: int) -> float:
+    return min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+def _on_error(e: Exception, attempt: int) -> float | None:
+    """Секунды до повтора или None, если повторять не нужно."""
+    if _error_code(e) == "ThrottlingException":
+        limiter.on_throttle()
+    if not _is_retryable(e) or attempt >= MAX_RETRIES:
+        return None
+    delay = _backoff(attempt)
+    logger.warning(f"Bedrock {_error_code(e) or type(e).__name__}, retry {attempt + 1}/{MAX_RETRIES} in {delay:.1f}s")
+    return delay
+
+def _on_success(out: Dict[str, Any], estimated: int) -> str:
+    limiter.on_success()
+    usage = out.get("usage") or {}
+    if usage:
+        limiter.settle(estimated, int(usage.get("input_tokens", 0)) + int(usage.get("output_tokens", 0)))
+    return out["content"][0]["text"]
+
+def chat(prompt: str, max_tokens: int = 512, temperature: float = 0.2, use_cache: bool = True) -> str:
+    """
+    Send a simple chat prompt to Anthropic Claude on Amazon Bedrock and return the text reply.
+    Requires AWS credentials to be configured in the environment/credentials file.
+    Replies are cached in llm_cache by (model, temperature, max_tokens, prompt hash);
+    pass use_cache=False (or set LLM_CACHE_DISABLED=1) to always call the model.
+    Calls are paced by the process-wide rate limiter and retried on throttling.
+    """
+    use_cache = use_cache and not llm_cache.DISABLED
+    if use_cache:
+        key = llm_cache.cache_key(MODEL_ID, prompt, max_tokens, temperature)
+        cached = llm_cache.get(key)
+        if cached is not None:
+            return cached
+
+    body = _request_body(prompt, max_tokens, temperature)
+    estimated = _estimate_tokens(prompt, max_tokens)
+    attempt = 0
+    while True:
+        limiter.acquire(estimated)
+        try:
+            out = _invoke(body)
+            break
+        except Exception as e:
+            delay = _on_error(e, attempt)
+            if delay is None:
+                raise
+            time.sleep(delay)
+            attempt += 1
+    text = _on_success(out, estimated)
+    if use_cache:
+        llm_cache.put(key, MODEL_ID, len(prompt), text)
+    return text
+
+async def achat(prompt: str, max_tokens: int = 512, temperature: float = 0.2, use_cache: bool = True) -> str:
+    """
+    Async-вариант chat(): ожидание очереди limiter'а и паузы между повторами
+    не занимают поток; сам вызов boto3 выполняется в пуле потоков.
+    """
+    use_cache = use_cache and not llm_cache.DISABLED
+    if use_cache:
+        key = llm_cache.cache_key(MODEL_ID, prompt, max_tokens, temperature)
+        cached = await asyncio.to_thread(llm_cache.get, key)
+        if cached is not None:
+            return cached
+
+    body = _request_body(prompt, max_tokens, temperature)
+    estimated = _estimate_tokens(prompt, max_tokens)
+    attempt = 0
+    while True:
+        await limiter.aacquire(estimated)
+        try:
+            out = await asyncio.to_thread(_invoke, body)
+            break
+        except Exception as e:
+            delay = _on_error(e, attempt)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+            attempt += 1
+    text = _on_success(out, estimated)
+    if use_cache:
+        await asyncio.to_thread(llm_cache.put, key, MODEL_ID, len(prompt), text)
+    return text
+
+async def _achat_many(prompts: Sequence[str], **kwargs: Any) -> List[Any]:
+    return await asyncio.gather(*(achat(p, **kwargs) for p in prompts), return_exceptions=True)
+
+def chat_many(prompts: Sequence[str], **kwargs: Any) -> List[Any]:
+    """
+    Параллельные achat() для списка промптов (куски одного документа) из
+    синхронного кода. Результаты в исходном порядке; исключение отдельного
+    вызова возвращается на его месте.
+    """
+    if not prompts:
+        return []
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(_achat_many(prompts, **kwargs))
+    # вызвали из потока с работающим event loop — свой loop в отдельном потоке
+    with ThreadPoolExecutor(max_workers=1) as ex:
+        return ex.submit(asyncio.run, _achat_many(prompts, **kwargs)).result()
+
+def _open_stream(body: Dict[str, Any]):
+    resp = _bedrock.invoke_model_with_response_stream(
         modelId=MODEL_ID,
         contentType="application/json",
         accept="application/json",
         body=json.dumps(body),
     )
-    out = json.loads(resp["body"].read())
-    return out["content"][0]["text"]
+    return resp["body"]
+
+def _close_opened(opening: asyncio.Future) -> None:
+    # клиент ушёл, пока стрим открывался: закрываем его, когда открытие завершится
+    if not opening.cancelled() and opening.exception() is None:
+        opening.result().close()
+
+def _iter_deltas(stream, usage: Dict[str, int]) -> Iterator[str]:
+    for event in stream:
+        chunk = event.get("chunk")
+        if not chunk:
+            continue
+        data = json.loads(chunk["bytes"])
+        if data.get("type") == "content_block_delta" and data.get("delta", {}).get("type") == "text_delta":
+            yield data["delta"]["text"]
+        metrics = data.get("amazon-bedrock-invocationMetrics")
+        if metrics:
+            usage["tokens"] = int(metrics.get("inputTokenCount", 0)) + int(metrics.get("outputTokenCount", 0))
+
+async def astream_chat(prompt: str, max_tokens: int = 1024, temperature: float = 0.2) -> AsyncIterator[str]:
+    """
+    Ответ модели по кусочкам текста (invoke_model_with_response_stream).
+    События читает поток из _stream_executor; если потребитель перестал читать
+    (клиент отключился), upstream-стрим закрывается.
+    """
+    body = _request_body(prompt, max_tokens, temperature)
+    estimated = _estimate_tokens(prompt, max_tokens)
+    async with _stream_slots:
+        loop = asyncio.get_running_loop()
+        attempt = 0
+        while True:
+            await limiter.aacquire(estimated)
+            opening = loop.run_in_executor(_stream_executor, _open_stream, body)
+            try:
+                stream = await asyncio.shield(opening)
+                break
+            except asyncio.CancelledError:
+                opening.add_done_callback(_close_opened)
+                raise
+            except Exception as e:
+                delay = _on_error(e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+
+        queue: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        usage: Dict[str, int] = {}
+        done = object()
+
+        def put(item: Any) -> None:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+            except RuntimeError:  # event loop уже закрыт
+                pass
+
+        def pump() -> None:
+            try:
+                for piece in _iter_deltas(stream, usage):
+                    if stop.is_set():
+                        break
+                    put(piece)
+            except Exception as e:
+                if not stop.is_set():
+                    put(e)
+            finally:
+                stream.close()
+                put(done)
+
+        loop.run_in_executor(_stream_executor, pump)
+        try:
+            while (item := await queue.get()) is not done:
+                if isinstance(item, Exception):
+                    if _error_code(item) == "ThrottlingException":
+                        limiter.on_throttle()
+                    raise item
+                yield item
+            limiter.on_success()
+            if usage:
+                limiter.settle(estimated, usage["tokens"])
+        finally:
+            stop.set()
+            stream.close()  # обрывает ожидание следующего события в pump
+
+def limiter_stats() -> Dict[str, Any]:
+    return limiter.stats()
@@ -0,0 +1,99 @@
+import os
+import re
+import time
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+# Кэш свободного диалога (/chat/reply) в памяти процесса: дашборды шлют одни и те же
+# вопросы. Ключ — нормализованный промпт (регистр, пробелы, финальная пунктуация),
+# LRU на MAX_ENTRIES записей с коротким TTL. Одинаковые запросы, пришедшие, пока
+# первый ещё ждёт Bedrock, не делают своих вызовов, а ждут тот же результат.
+TTL_SECONDS = float(os.getenv("CHAT_CACHE_TTL_SECONDS", "300"))
+MAX_ENTRIES = int(os.getenv("CHAT_CACHE_MAX_ENTRIES", "1000"))   # 0 = только объединение запросов
+
+_SPACE_RE = re.compile(r"\s+")
+_TRAILING_RE = re.compile(r"[\s?!.]+$")
+
+_entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()  # key -> (expires_at, reply)
+_inflight: Dict[str, asyncio.Task] = {}
+_lock = threading.Lock()
+_stats: Dict[str, int] = {"hits": 0, "misses": 0, "coalesced": 0, "expired": 0, "evictions": 0, "errors": 0}
+
+def normalize(prompt: str) -> str:
+    return _TRAILING_RE.sub("", _SPACE_RE.sub(" ", prompt).strip().lower())
+
+def cache_key(prompt: str, *params: Any) -> str:
+    raw = "|".join([normalize(prompt), *(str(p) for p in params)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def _lookup(key: str) -> str | None:
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del _entries[key]
+            _stats["expired"] += 1
+            return None
+        _entries.move_to_end(key)
+        _stats["hits"] += 1
+        return entry[1]
+
+def _store(key: str, reply: str) -> None:
+    if MAX_ENTRIES <= 0 or TTL_SECONDS <= 0:
+        return
+    with _lock:
+        _entries[key] = (time.monotonic() + TTL_SECONDS, reply)
+        _entries.move_to_end(key)
+        while len(_entries) > MAX_ENTRIES:
+            _entries.popitem(last=False)
+            _stats["evictions"] += 1
+
+def _finished(key: str, task: asyncio.Task) -> None:
+    _inflight.pop(key, None)
+    if task.cancelled():
+        return
+    if task.exception() is not None:
+        with _lock:
+            _stats["errors"] += 1
+        return
+    _store(key, task.result())
+
+async def get_or_call(key: str, call: Callable[[], Awaitable[str]]) -> str:
+    """
+    Ответ из кэша, из уже идущего вызова с тем же ключом или из нового call().
+    Вызов идёт отдельной задачей: отключение первого клиента не обрывает его
+    для остальных, ожидающих тот же ответ.
+    """
+    cached = _lookup(key)
+    if cached is not None:
+        return cached
+    task = _inflight.get(key)
+    with _lock:
+        _stats["coalesced" if task else "misses"] += 1
+    if task is None:
+        task = asyncio.ensure_future(call())
+        _inflight[key] = task
+        task.add_done_callback(lambda t: _finished(key, t))
+    return await asyncio.shield(task)
+
+def clear() -> int:
+    with _lock:
+        n = len(_entries)
+        _entries.clear()
+        return n
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        out: Dict[str, Any] = dict(_stats)
+        out["entries"] = len(_entries)
+    requests = out["hits"] + out["misses"] + out["coalesced"]
+    # доля запросов, обошедшихся без собственного вызова Bedrock
+    out["hit_rate"] = round((out["hits"] + out["coalesced"]) / requests, 3) if requests else 0.0
+    out["inflight"] = len(_inflight)
+    out["max_entries"] = MAX_ENTRIES
+    out["ttl_seconds"] = TTL_SECONDS
+    return out
@@ -0,0 +1,74 @@
+import re
+from typing import List, Sequence, Tuple, Union
+
+# Границы разделов в нормативных текстах: "§ 1910.134", "1910.1200(b)", "Section 3", "(a) ..."
+_SECTION_RE = re.compile(
+    r"\n(?=[ \t]*(?:§\s*\d|\d{3,4}\.\d+|(?:SECTION|Section|Subpart|SUBPART)\s+\w|\([a-z0-9]{1,3}\)\s))"
+)
+_SEPARATORS = [_SECTION_RE, re.compile(r"\n\s*\n"), re.compile(r"\n"), re.compile(r"(?<=[.;:])\s+"), re.compile(r"\s+")]
+
+def _split_oversized(text: str, max_chars: int, level: int = 0) -> List[str]:
+    """Режет текст длиннее max_chars по самой крупной доступной границе."""
+    if len(text) <= max_chars:
+        return [text]
+    if level >= len(_SEPARATORS):
+        return [text[i:i + max_chars] for i in range(0, len(text), max_chars)]
+    cuts = [m.end() for m in _SEPARATORS[level].finditer(text)]
+    if not cuts:
+        return _split_oversized(text, max_chars, level + 1)
+    parts, start = [], 0
+    for cut in cuts + [len(text)]:
+        if cut > start:
+            parts.append(text[start:cut])
+            start = cut
+    out: List[str] = []
+    for part in parts:
+        out.extend(_split_oversized(part, max_chars, level + 1))
+    return out
+
+def chunk_document(doc: Union[str, Sequence[str]], max_chars: int) -> List[str]:
+    """
+    Делит документ на куски не длиннее max_chars для map-reduce вызовов LLM.
+    doc — строка или список страниц; страницы и разделы не разрываются,
+    пока помещаются в кусок, соседние мелкие части склеиваются.
+    """
+    pages = [doc] if isinstance(doc, str) else list(doc)
+    pieces: List[Tuple[int, str]] = []  # (номер страницы, часть)
+    for n, page in enumerate(pages):
+        if page and page.strip():
+            pieces.extend((n, piece) for piece in _split_oversized(page, max_chars))
+
+    chunks: List[str] = []
+    current = ""
+    current_page = -1
+    for page, piece in pieces:
+        # части одной страницы уже заканчиваются своим разделителем — склеиваем как есть
+        sep = "\n" if current and page != current_page else ""
+        current_page = page
+        if len(current) + len(sep) + len(piece) <= max_chars:
+            current += sep + piece
+        else:
+            if current.strip():
+                chunks.append(current)
+            current = piece
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
+def merge_by_key(results: Sequence[Sequence[dict]], key: str, evidence_field: str) -> List[dict]:
+    """
+    Reduce-шаг: объединяет ответы по кускам, для каждого key оставляет
+    максимальный confidence (при равенстве — более длинное обоснование).
+    Порядок — по первому появлению.
+    """
+    best: dict = {}
+    for items in results:
+        for item in items:
+            k = item.get(key)
+            if not k:
+                continue
+            cur = best.get(k)
+            rank = (float(item.get("confidence", 0)), len(item.get(evidence_field) or ""))
+            if cur is None or rank > (float(cur.get("confidence", 0)), len(cur.get(evidence_field) or "")):
+                best[k] = item
+    return list(best.values())
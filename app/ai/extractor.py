@@ -1,6 +1,11 @@
 import json
-from typing import List, Dict, Any
-from app.ai.bedrock_client import chat as bedrock_chat
+import logging
+from typing import List, Dict, Any, Union
+from app.ai.bedrock_client import chat_many
+from app.ai.chunking import chunk_document, merge_by_key
+from app.ai.prefilter import Bm25Index, course_text, shortlist
+
+logger = logging.getLogger(__name__)
 
 SYS_PROMPT = """Ты — ассистент по охране труда. Тебе дают текст из нормативного PDF и каталог курсов (id и название).
 Задача: вернуть JSON с массивом matches, где каждый элемент: { "course_id": str, "confidence": 0..1, "evidence": str }.
@@ -11,18 +16,9 @@ SYS_PROMPT = """Ты — ассистент по охране труда. Теб
 Верни ТОЛЬКО JSON, без пояснений.
 """
 
-def extract_courses(text: str, catalog: List[Dict[str,str]]) -> List[Dict[str,Any]]:
-    # Подготавливаем компактный каталог для подсказки модели
-    cat_lines = [f'{c["course_id"]} :: {c.get("title","")}' for c in catalog]
-    prompt = (
-        SYS_PROMPT
-        + "\n\nКаталог курсов:\n"
-        + "\n".join(cat_lines[:200])  # ограничим до 200 строк на всякий случай
-        + "\n\nФрагмент нормативного текста:\n"
-        + text[:20000]  # не перегружаем модель
-        + "\n\nJSON:"
-    )
-    out = bedrock_chat(prompt, max_tokens=800, temperature=0.1)
+CHUNK_CHARS = 20000  # не перегружаем модель: длинный документ идёт несколькими кусками
+
+def _parse_matches(out: str) -> List[Dict[str,Any]]:
     try:
         data = json.loads(out)
         matches = data.get("matches", [])
@@ -39,3 +35,35 @@ def extract_courses(text: str, catalog: List[Dict[str,str]]) -> List[Dict[str,An
     except Exception:
         # если модель ответила не-JSON — возвращаем пусто
         return []
+
+def extract_courses(text: Union[str, List[str]], catalog: List[Dict[str,str]], use_cache: bool = True) -> List[Dict[str,Any]]:
+    """
+    Map-reduce по всему документу: text (строка или список страниц) режется
+    на куски по страницам/разделам, куски уходят в Bedrock параллельно,
+    результаты объединяются по course_id с максимальным confidence.
+    """
+    # BM25 по каталогу (id, название, описание, теги): в промпт каждого куска
+    # идут только prefilter.TOP_K ближайших к нему курсов
+    index = Bm25Index([course_text(c) for c in catalog])
+    prompts = []
+    for chunk in chunk_document(text, CHUNK_CHARS):
+        cat_lines = [f'{c["course_id"]} :: {c.get("title","")}' for c in shortlist(catalog, index, chunk)]
+        catalog_block = "\n".join(cat_lines[:200])  # ограничим до 200 строк на всякий случай
+        prompts.append(
+            SYS_PROMPT
+            + "\n\nКаталог курсов:\n"
+            + catalog_block
+            + "\n\nФрагмент нормативного текста:\n"
+            + chunk
+            + "\n\nJSON:"
+        )
+    if not prompts:
+        return []
+    logger.info(f"Course extraction: {len(prompts)} chunks, {sum(map(len, prompts))} prompt chars, catalog of {len(catalog)}")
+    outs = chat_many(prompts, max_tokens=800, temperature=0.1, use_cache=use_cache)
+    errors = [o for o in outs if isinstance(o, Exception)]
+    if errors and len(errors) == len(outs):
+        raise errors[0]
+    if errors:
+        logger.warning(f"Course extraction: {len(errors)}/{len(outs)} chunks failed: {str(errors[0])[:200]}")
+    return merge_by_key([_parse_matches(o) for o in outs if not isinstance(o, Exception)], "course_id", "evidence")
@@ -0,0 +1,100 @@
+import os
+import random
+import hashlib
+import logging
+import threading
+from typing import Dict, Optional
+from app.db import get_conn
+
+logger = logging.getLogger(__name__)
+
+# Постоянный кэш ответов LLM в Postgres (таблица llm_cache).
+# Повторная обработка неизменённого документа берёт ответы отсюда, а не из Bedrock.
+TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "20000"))
+DISABLED = os.getenv("LLM_CACHE_DISABLED", "").strip().lower() in ("1", "true", "yes")
+EVICT_EVERY = 50  # в среднем раз на столько записей чистим просроченное и лишнее
+
+_stats: Dict[str, int] = {"hits": 0, "misses": 0, "writes": 0, "errors": 0}
+_stats_lock = threading.Lock()
+
+def _count(name: str) -> None:
+    with _stats_lock:
+        _stats[name] += 1
+
+def cache_key(model_id: str, prompt: str, max_tokens: int, temperature: float) -> str:
+    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    raw = f"{model_id}|{float(temperature):.4f}|{int(max_tokens)}|{prompt_hash}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def get(key: str) -> Optional[str]:
+    """Ответ из кэша или None. Ошибки БД не ломают вызов LLM — считаем промахом."""
+    try:
+        with get_conn() as conn, conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE llm_cache
+                SET hit_count = hit_count + 1, last_hit_at = now()
+                WHERE cache_key=%s AND expires_at > now()
+                RETURNING response
+                """,
+                (key,),
+            )
+            row = cur.fetchone()
+    except Exception as e:
+        logger.warning(f"LLM cache read failed: {e}")
+        _count("errors")
+        return None
+    _count("hits" if row else "misses")
+    return row["response"] if row else None
+
+def put(key: str, model_id: str, prompt_chars: int, response: str) -> None:
+    try:
+        with get_conn() as conn, conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO llm_cache (cache_key, model_id, response, prompt_chars, expires_at)
+                VALUES (%s, %s, %s, %s, now() + make_interval(secs => %s))
+                ON CONFLICT (cache_key) DO UPDATE
+                  SET response = EXCLUDED.response,
+                      created_at = now(),
+                      last_hit_at = now(),
+                      expires_at = EXCLUDED.expires_at
+                """,
+                (key, model_id, response, prompt_chars, TTL_SECONDS),
+            )
+            if random.randrange(EVICT_EVERY) == 0:
+                _evict(cur)
+        _count("writes")
+    except Exception as e:
+        logger.warning(f"LLM cache write failed: {e}")
+        _count("errors")
+
+def _evict(cur) -> None:
+    cur.execute("DELETE FROM llm_cache WHERE expires_at <= now()")
+    expired = cur.rowcount
+    # сверх лимита — удаляем давно не использованные
+    cur.execute(
+        """
+        DELETE FROM llm_cache WHERE cache_key IN (
+          SELECT cache_key FROM llm_cache ORDER BY last_hit_at DESC OFFSET %s
+        )
+        """,
+        (MAX_ENTRIES,),
+    )
+    if expired or cur.rowcount:
+        logger.info(f"LLM cache eviction: {expired} expired, {cur.rowcount} over limit")
+
+def stats() -> Dict[str, object]:
+    with _stats_lock:
+        out: Dict[str, object] = dict(_stats)
+    lookups = out["hits"] + out["misses"]
+    out["hit_rate"] = round(out["hits"] / lookups, 3) if lookups else 0.0
+    out["disabled"] = DISABLED
+    try:
+        with get_conn() as conn, conn.cursor() as cur:
+            cur.execute("SELECT COUNT(*) AS entries FROM llm_cache WHERE expires_at > now()")
+            out["entries"] = cur.fetchone()["entries"]
+    except Exception as e:
+        logger.warning(f"LLM cache stats failed: {e}")
+    return out
@@ -1,5 +1,19 @@
 import re
-from typing import List, Tuple, Dict
+import logging
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Внутренний парсер re нужен только для lookahead-ускорения (_start_guard).
+# Это приватные модули CPython (в 3.11 переименованы); если их нет, матчер
+# ищет каждым правилом отдельно, как раньше (общий regex без lookahead медленнее).
+try:
+    from re import _constants as sre_c, _parser as sre_parse      # 3.11+
+except ImportError:
+    try:
+        import sre_constants as sre_c, sre_parse                   # до 3.11
+    except ImportError:
+        sre_c = sre_parse = None
 
 # Ключевые слова/паттерны -> course_id
 _RULES: Dict[str, str] = {
@@ -22,28 +36,191 @@ _RULES: Dict[str, str] = {
     r"\bergonomics\b": "ERG-101",
 }
 
+def _first_chars(items) -> Optional[Set[str]]:
+    """
+    Множество символов, с которых может начаться совпадение разобранного
+    паттерна; None — если определить нельзя (класс \\w, '.', пустое совпадение).
+    """
+    for op, av in items:
+        if op is sre_c.AT:  # \b, ^ — не потребляют символов
+            continue
+        if op is sre_c.LITERAL:
+            return {chr(av)}
+        if op is sre_c.IN:
+            chars: Set[str] = set()
+            for iop, iav in av:
+                if iop is sre_c.LITERAL:
+                    chars.add(chr(iav))
+                elif iop is sre_c.RANGE and iav[1] - iav[0] < 64:
+                    chars.update(chr(c) for c in range(iav[0], iav[1] + 1))
+                else:
+                    return None
+            return chars
+        if op is sre_c.BRANCH:
+            chars = set()
+            for branch in av[1]:
+                sub = _first_chars(branch)
+                if sub is None:
+                    return None
+                chars |= sub
+            return chars
+        if op is sre_c.SUBPATTERN:
+            return _first_chars(av[-1])
+        if op in (sre_c.MAX_REPEAT, sre_c.MIN_REPEAT) and av[0] > 0:
+            return _first_chars(av[2])
+        return None
+    return None
+
+def _starts_at_boundary(items) -> bool:
+    """True, если каждая альтернатива паттерна начинается с \\b."""
+    if not len(items):
+        return False
+    op, av = items[0]
+    if op is sre_c.AT:
+        return av is sre_c.AT_BOUNDARY
+    if op is sre_c.BRANCH:
+        return all(_starts_at_boundary(branch) for branch in av[1])
+    if op is sre_c.SUBPATTERN:
+        return _starts_at_boundary(av[-1])
+    return False
+
+def _has_group_refs(items) -> bool:
+    """True, если в паттерне есть ссылки на группы (\\1, (?P=name), (?(1)...))."""
+    stack = [items]
+    while stack:
+        for op, av in stack.pop():
+            if op in (sre_c.GROUPREF, sre_c.GROUPREF_EXISTS):
+                return True
+            for x in av if isinstance(av, (tuple, list)) else (av,):
+                if isinstance(x, sre_parse.SubPattern):
+                    stack.append(x)
+                elif isinstance(x, (tuple, list)):
+                    stack.extend(y for y in x if isinstance(y, sre_parse.SubPattern))
+    return False
+
+def _combinable(pattern: str) -> bool:
+    """
+    Можно ли искать правило в общем regex: без именованных групп и ссылок на
+    группы (номера и имена групп в общем regex другие) и без флагов вроде (?i),
+    которые компилируются сами по себе, но не внутри общего regex.
+    """
+    try:
+        re.compile("(?:)|(?:" + pattern + ")")
+        parsed = sre_parse.parse(pattern)
+        return not parsed.state.groupdict and not _has_group_refs(parsed)
+    except Exception:
+        return False
+
+def _start_guard(pattern: str) -> Optional[str]:
+    """
+    Lookahead по первым символам: в позициях, с которых не начинается ни один
+    паттерн, regex не перебирает все альтернативы (иначе один проход медленнее
+    отдельных finditer по каждому правилу). None — парсер re недоступен.
+    """
+    if sre_parse is None:
+        return None
+    try:
+        parsed = sre_parse.parse(pattern)
+        chars = _first_chars(parsed)
+        guard = r"\b" if _starts_at_boundary(parsed) else ""
+    except Exception:
+        # внутреннее устройство парсера могло поменяться
+        return None
+    if chars:
+        guard += "(?=[" + "".join(re.escape(c) for c in sorted(chars)) + "])"
+    return guard
+
+Rule = Tuple[str, str, float]  # (pattern, course_id, weight)
+
+class CompiledMatcher:
+    """
+    Все паттерны в одном регулярном выражении, документ просматривается за один
+    проход. В каждой позиции, где совпадает хотя бы одно правило, каждое правило
+    проверяется своим lookahead с группой (?P<gN>...): совпадения разных правил
+    могут перекрываться, как при отдельном finditer на каждое правило.
+    Правила, которые нельзя включить в общий regex, ищутся по отдельности.
+    """
+
+    def __init__(self, rules: Iterable[Rule]):
+        self.rules: List[Rule] = []
+        self.skipped: List[Tuple[str, str, str]] = []  # (pattern, course_id, ошибка)
+        compiled: List[re.Pattern] = []
+        for pattern, course_id, weight in rules:
+            try:
+                rx = re.compile(pattern, flags=re.IGNORECASE)
+            except re.error as e:
+                logger.warning(f"Skipping invalid mapping rule {pattern!r} -> {course_id}: {e}")
+                self.skipped.append((pattern, course_id, str(e)))
+                continue
+            compiled.append(rx)
+            self.rules.append((pattern, course_id, float(weight)))
+
+        combined = [] if sre_parse is None else [i for i, (p, _, _) in enumerate(self.rules) if _combinable(p)]
+        self.regex = None
+        self._groups: List[Tuple[int, int]] = []  # (номер правила, номер группы в self.regex)
+        if combined:
+            any_rule = "|".join(f"(?:{self.rules[i][0]})" for i in combined)
+            each_rule = "".join(f"(?=(?P<g{i}>{self.rules[i][0]}))?" for i in combined)
+            guard = _start_guard(any_rule)
+            try:
+                self.regex = re.compile(f"{guard or ''}(?=(?:{any_rule})){each_rule}", flags=re.IGNORECASE)
+            except re.error as e:
+                # каждое правило по отдельности корректно — ищем ими по очереди, но не падаем
+                logger.error(f"Combined mapping regex failed to compile, matching rule by rule: {e}")
+                combined = []
+            else:
+                self._groups = [(int(name[1:]), group) for name, group in self.regex.groupindex.items()]
+        in_regex = set(combined)
+        self.per_rule: List[Tuple[int, re.Pattern]] = [
+            (i, rx) for i, rx in enumerate(compiled) if i not in in_regex
+        ]
+
+    def _spans(self, text: str):
+        """(номер правила, span) для каждого совпадения — те же, что дал бы finditer правила."""
+        if self.regex is not None:
+            last_end: Dict[int, int] = {}
+            for m in self.regex.finditer(text):
+                for i, group in self._groups:
+                    start, end = m.span(group)
+                    # finditer правила продолжает поиск с конца предыдущего совпадения
+                    if start >= 0 and start >= last_end.get(i, 0):
+                        last_end[i] = end
+                        yield i, (start, end)
+        for i, rx in self.per_rule:
+            for m in rx.finditer(text):
+                yield i, m.span()
+
+    def rule_hits(self, text: str) -> Dict[int, Tuple[int, Tuple[int, int]]]:
+        """Номер правила -> (число совпадений, span первого)."""
+        hits: Dict[int, Tuple[int, Tuple[int, int]]] = {}
+        for i, span in self._spans(text):
+            count, first = hits.get(i, (0, span))
+            hits[i] = (count + 1, first)
+        return hits
+
+    def match(self, text: str) -> List[Tuple[str, float, str]]:
+        hits = self.rule_hits(text)
+        # несколько правил на один курс — берём максимальный confidence
+        best: Dict[str, Tuple[str, float, str]] = {}
+        for i in sorted(hits):
+            _, course_id, weight = self.rules[i]
+            count, (start, end) = hits[i]
+            conf = min(1.0, weight * (0.5 + 0.25 * (count - 1)))  # 1 матч=0.5; 2=0.75; >=3 -> 1.0 (при weight=1)
+            if course_id in best and best[course_id][1] >= conf:
+                continue
+            excerpt = text[max(0, start - 120):min(len(text), end + 120)].strip().replace("\n", " ")
+            best[course_id] = (course_id, conf, excerpt[:500])
+        return list(best.values())
+
+BUILTIN_RULES: List[Rule] = [(pattern, course_id, 1.0) for pattern, course_id in _RULES.items()]
+
+_matcher = CompiledMatcher(BUILTIN_RULES)
+
 def map_text_to_courses(text: str) -> List[Tuple[str, float, str]]:
     """
-    Возвращает список (course_id, confidence 0..1, excerpt).
+    Возвращает список (course_id, confidence 0..1, excerpt) по встроенным правилам _RULES.
     confidence ~ кол-ву совпадений паттерна (ограничим до 1.0).
     excerpt — первый фрагмент вокруг совпадения.
+    Правила из таблицы mapping_rules — app.ai.mapping_rules.map_text_to_courses.
     """
-    out = []
-    low = text.lower()
-    for pattern, course_id in _RULES.items():
-        matches = list(re.finditer(pattern, low, flags=re.IGNORECASE))
-        if not matches:
-            continue
-        hits = len(matches)
-        conf = min(1.0, 0.5 + 0.25 * (hits - 1))  # 1 матч=0.5; 2=0.75; >=3 -> 1.0
-        m0 = matches[0]
-        start = max(0, m0.start() - 120)
-        end = min(len(text), m0.end() + 120)
-        excerpt = text[start:end].strip().replace("\n", " ")
-        out.append((course_id, conf, excerpt[:500]))
-    # Удаляем дубль курсов (если несколько паттернов попали на один курс)
-    dedup: Dict[str, Tuple[str,float,str]] = {}
-    for cid, conf, ex in out:
-        if cid not in dedup or conf > dedup[cid][1]:
-            dedup[cid] = (cid, conf, ex)
-    return list(dedup.values())
+    return _matcher.match(text)
@@ -0,0 +1,97 @@
+import os
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from app.db import get_conn
+from app.ai.mappers import BUILTIN_RULES, CompiledMatcher, Rule
+
+logger = logging.getLogger(__name__)
+
+# Правила keyword -> course из таблицы mapping_rules. Скомпилированный матчер
+# живёт в памяти процесса и пересобирается, только когда меняется
+# mapping_rules_version (её увеличивает триггер); версию проверяем не чаще
+# раза в POLL_SECONDS, так что на документ запросов к БД нет.
+POLL_SECONDS = float(os.getenv("MAPPING_RULES_POLL_SECONDS", "10"))
+
+_lock = threading.Lock()
+_version: Optional[int] = None
+_checked_at = float("-inf")
+_matchers: Dict[str, CompiledMatcher] = {}  # region ('' = только общие правила) -> матчер
+_builtin = CompiledMatcher(BUILTIN_RULES)   # если таблица недоступна
+
+def _refresh_version() -> None:
+    global _version, _checked_at
+    now = time.monotonic()
+    if now - _checked_at < POLL_SECONDS:
+        return
+    _checked_at = now
+    try:
+        with get_conn() as conn, conn.cursor() as cur:
+            cur.execute("SELECT version FROM mapping_rules_version WHERE id = 1")
+            row = cur.fetchone()
+        version = row["version"] if row else None
+    except Exception as e:
+        # оставляем текущие матчеры; после восстановления БД версия не совпадёт и они пересоберутся
+        logger.warning(f"Mapping rules version check failed: {e}")
+        _version = None
+        return
+    if version != _version:
+        if _version is not None:
+            logger.info(f"Mapping rules changed (version {_version} -> {version}), recompiling")
+        _matchers.clear()
+        _version = version
+
+def _load_rules(region: Optional[str]) -> Optional[List[Rule]]:
+    try:
+        with get_conn() as conn, conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT pattern, course_id, weight
+                FROM mapping_rules
+                WHERE active AND (region IS NULL OR region = %s)
+                ORDER BY rule_id
+                """,
+                (region,),
+            )
+            return [(r["pattern"], r["course_id"], float(r["weight"])) for r in cur.fetchall()]
+    except Exception as e:
+        logger.warning(f"Loading mapping rules failed, using built-in rules: {e}")
+        return None
+
+def get_matcher(region: Optional[str] = None) -> CompiledMatcher:
+    """Скомпилированный матчер для региона (общие правила + правила региона)."""
+    global _version
+    key = region or ""
+    with _lock:
+        _refresh_version()
+        matcher = _matchers.get(key)
+        if matcher is None:
+            rules = _load_rules(region)
+            if rules is None:
+                # БД недоступна: встроенные правила до следующей проверки версии;
+                # сброс _version заставит её пересобрать матчеры из таблицы
+                _version = None
+                matcher = _builtin
+            else:
+                matcher = CompiledMatcher(rules)
+            _matchers[key] = matcher
+        return matcher
+
+def invalidate() -> None:
+    """Проверить версию при следующем вызове (после изменения правил в этом процессе)."""
+    global _checked_at
+    with _lock:
+        _checked_at = float("-inf")
+
+def map_text_to_courses(text: str, region: Optional[str] = None) -> List[Tuple[str, float, str]]:
+    """То же, что app.ai.mappers.map_text_to_courses, но по правилам из mapping_rules."""
+    return get_matcher(region).match(text)
+
+def cache_info() -> Dict[str, Any]:
+    with _lock:
+        return {
+            "version": _version,
+            "poll_seconds": POLL_SECONDS,
+            "compiled": {key or None: len(m.rules) for key, m in _matchers.items()},
+        }
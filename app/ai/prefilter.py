@@ -0,0 +1,80 @@
+import os
+import re
+import math
+from collections import Counter, defaultdict
+from typing import Dict, List, Sequence
+
+# Локальный BM25 между куском документа и каталогом курсов: в промпт уходят
+# только TOP_K ближайших курсов, а не весь каталог.
+TOP_K = int(os.getenv("PREFILTER_TOP_K", "20"))   # 0 = не фильтровать
+K1 = 1.2
+B = 0.75
+
+# слова и номера стандартов целиком: "1910.134", "3395"
+_TOKEN_RE = re.compile(r"[a-z]+|\d+(?:\.\d+)*")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from in into is it of on or shall that the this to with "
+    "each any all other such which who when where will may must not their its".split()
+)
+
+def tokenize(text: str) -> List[str]:
+    out = []
+    for tok in _TOKEN_RE.findall(text.lower()):
+        if tok in _STOPWORDS or len(tok) < 2:
+            continue
+        # грубый стемминг множественного числа: ladders -> ladder
+        if len(tok) > 4 and tok.endswith("s") and not tok.endswith("ss") and tok[0].isalpha():
+            tok = tok[:-1]
+        out.append(tok)
+    return out
+
+def course_text(course: Dict[str, str]) -> str:
+    return " ".join(str(course.get(f) or "") for f in ("course_id", "title", "description", "tags"))
+
+class Bm25Index:
+    """Okapi BM25 по коротким документам (курсам) с обратным индексом term -> [(doc, tf)]."""
+
+    def __init__(self, docs: Sequence[str]):
+        self.size = len(docs)
+        self.lengths: List[int] = []
+        self.postings: Dict[str, List[tuple]] = defaultdict(list)
+        for i, doc in enumerate(docs):
+            tokens = tokenize(doc)
+            self.lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                self.postings[term].append((i, tf))
+        self.avg_len = (sum(self.lengths) / self.size) if self.size else 0.0
+        self.idf = {
+            term: math.log(1 + (self.size - len(p) + 0.5) / (len(p) + 0.5))
+            for term, p in self.postings.items()
+        }
+
+    def scores(self, query: str) -> Dict[int, float]:
+        out: Dict[int, float] = defaultdict(float)
+        for term, qtf in Counter(tokenize(query)).items():
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            # повторы термина в длинном куске текста учитываем логарифмически
+            weight = self.idf[term] * (1 + math.log(qtf))
+            for i, tf in postings:
+                norm = tf + K1 * (1 - B + B * self.lengths[i] / self.avg_len)
+                out[i] += weight * tf * (K1 + 1) / norm
+        return out
+
+    def top_k(self, query: str, k: int) -> List[int]:
+        scored = self.scores(query)
+        return sorted(scored, key=lambda i: (-scored[i], i))[:k]
+
+def shortlist(catalog: List[Dict[str, str]], index: Bm25Index, chunk: str, k: int | None = None) -> List[Dict[str, str]]:
+    """
+    Top-K курсов каталога для куска текста (в исходном порядке каталога).
+    Если лексически ничего не совпало — весь каталог, чтобы не терять recall.
+    """
+    k = TOP_K if k is None else k
+    if k <= 0 or len(catalog) <= k:
+        return catalog
+    top = index.top_k(chunk, k)
+    if not top:
+        return catalog
+    return [catalog[i] for i in sorted(top)]
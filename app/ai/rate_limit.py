@@ -0,0 +1,119 @@
+import os
+import time
+import asyncio
+import threading
+from typing import Dict
+
+# Лимиты квоты Bedrock на процесс: запросы и токены в минуту.
+# Держимся чуть ниже квоты, а на ThrottlingException сами снижаем темп.
+REQUESTS_PER_MINUTE = float(os.getenv("BEDROCK_RPM", "50"))
+TOKENS_PER_MINUTE = float(os.getenv("BEDROCK_TPM", "200000"))
+BURST_SECONDS = float(os.getenv("BEDROCK_BURST_SECONDS", "10"))   # сколько секунд квоты можно выбрать разом
+MIN_RATE_FACTOR = 0.2        # ниже 20% квоты не опускаемся
+DECREASE_FACTOR = 0.7        # на троттлинг — темп на 30% меньше
+INCREASE_STEP = 0.05         # на каждый успешный вызов — +5% квоты
+DECREASE_COOLDOWN = 5.0      # сек: пачка одновременных отказов снижает темп один раз
+
+class _Bucket:
+    """
+    Token bucket с резервированием: уровень может уходить в минус (долг),
+    каждый следующий вызывающий ждёт дольше предыдущего — очередь FIFO.
+    """
+
+    def __init__(self, per_minute: float):
+        self.per_minute = per_minute
+        self.capacity = max(1.0, per_minute * BURST_SECONDS / 60.0)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float, factor: float) -> None:
+        rate = self.per_minute * factor / 60.0
+        self.level = min(self.capacity, self.level + (now - self.updated) * rate)
+        self.updated = now
+
+    def reserve(self, amount: float, now: float, factor: float) -> float:
+        """Списывает amount и возвращает, сколько секунд ждать до своей очереди."""
+        self._refill(now, factor)
+        # запрос больше всей ёмкости всё равно пропускаем, но после того как долг погашен
+        amount = min(amount, self.capacity)
+        self.level -= amount
+        if self.level >= 0:
+            return 0.0
+        return -self.level / (self.per_minute * factor / 60.0)
+
+    def adjust(self, delta: float, now: float, factor: float) -> None:
+        self._refill(now, factor)
+        self.level = min(self.capacity, self.level - delta)
+
+class AdaptiveRateLimiter:
+    """
+    Общий на процесс ограничитель вызовов Bedrock (requests/min + tokens/min).
+    AIMD: ThrottlingException уменьшает темп на 30%, успешные вызовы
+    понемногу возвращают его к квоте.
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self._lock = threading.Lock()
+        self._requests = _Bucket(requests_per_minute)
+        self._tokens = _Bucket(tokens_per_minute)
+        self._factor = 1.0
+        self._last_decrease = 0.0
+        self._stats: Dict[str, float] = {"acquired": 0, "waited_seconds": 0.0, "throttled": 0}
+
+    def reserve(self, tokens: int) -> float:
+        with self._lock:
+            now = time.monotonic()
+            wait = max(
+                self._requests.reserve(1, now, self._factor),
+                self._tokens.reserve(tokens, now, self._factor),
+            )
+            self._stats["acquired"] += 1
+            self._stats["waited_seconds"] += wait
+            return wait
+
+    def acquire(self, tokens: int) -> None:
+        """Блокирующее ожидание своей очереди (для синхронных вызовов)."""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self, tokens: int) -> None:
+        """То же без блокировки потока."""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def settle(self, estimated: int, actual: int) -> None:
+        """Поправка токенов после ответа: резервировали по оценке, списываем по usage."""
+        if actual == estimated:
+            return
+        with self._lock:
+            self._tokens.adjust(actual - estimated, time.monotonic(), self._factor)
+
+    def on_success(self) -> None:
+        with self._lock:
+            self._factor = min(1.0, self._factor + INCREASE_STEP)
+
+    def on_throttle(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._stats["throttled"] += 1
+            if now - self._last_decrease < DECREASE_COOLDOWN:
+                return
+            self._last_decrease = now
+            # запас ведра сгорает: следующие вызовы встают в очередь под новый темп
+            for bucket in (self._requests, self._tokens):
+                bucket._refill(now, self._factor)
+                bucket.level = min(bucket.level, 0.0)
+            self._factor = max(MIN_RATE_FACTOR, self._factor * DECREASE_FACTOR)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                **self._stats,
+                "rate_factor": round(self._factor, 3),
+                "requests_per_minute": round(self._requests.per_minute * self._factor, 1),
+                "tokens_per_minute": round(self._tokens.per_minute * self._factor),
+            }
+
+limiter = AdaptiveRateLimiter(REQUESTS_PER_MINUTE, TOKENS_PER_MINUTE)
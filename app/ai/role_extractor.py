@@ -1,8 +1,10 @@
 import json
-import time
-import random
-from typing import List, Dict, Any
-from app.ai.bedrock_client import chat as bedrock_chat
+import logging
+from typing import List, Dict, Any, Union
+from app.ai.bedrock_client import chat_many
+from app.ai.chunking import chunk_document, merge_by_key
+
+logger = logging.getLogger(__name__)
 
 ROLE_SYS_PROMPT = """You are a safety assistant. You are given text from a regulatory PDF and a list of employee roles.
 Task: determine which roles this document applies to.
@@ -18,48 +20,14 @@ Rules:
 Return ONLY JSON, no explanations.
 """
 
-def extract_roles(text: str, roles: List[Dict[str,str]]) -> List[Dict[str,Any]]:
-    """
-    Определяет подходящие роли для документа на основе его содержания
-    """
-    import logging
-    logger = logging.getLogger(__name__)
-    
-    # Подготавливаем список ролей
-    role_lines = [f'{r["name"]} :: {r.get("description", "")}' for r in roles]
-    prompt = (
-        ROLE_SYS_PROMPT
-        + "\n\nRole list:\n"
-        + "\n".join(role_lines[:50])  # ограничим количество ролей
-        + "\n\nRegulatory text fragment:\n"
-        + text[:15000]  # не перегружаем модель
-        + "\n\nJSON:"
-    )
-    
-    # Retry logic for throttling
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            if attempt > 0:
-                delay = (2 ** attempt) + random.uniform(0, 1)  # Exponential backoff
-                logger.info(f"Retrying Bedrock call in {delay:.2f}s (attempt {attempt + 1}/{max_retries})")
-                time.sleep(delay)
-            
-            out = bedrock_chat(prompt, max_tokens=600, temperature=0.1)
-            logger.info(f"Bedrock raw response for roles: {out}")
-            break
-        except Exception as e:
-            if "ThrottlingException" in str(e) and attempt < max_retries - 1:
-                logger.warning(f"Throttling on attempt {attempt + 1}, retrying...")
-                continue
-            else:
-                raise e
-    
+CHUNK_CHARS = 15000  # не перегружаем модель: длинный документ идёт несколькими кусками
+
+def _parse_roles(out: str) -> List[Dict[str,Any]]:
     try:
         data = json.loads(out)
         matches = data.get("roles", [])
         logger.info(f"Parsed role matches: {matches}")
-        
+
         # Валидация и нормализация
         norm = []
         for m in matches:
@@ -69,11 +37,40 @@ def extract_roles(text: str, roles: List[Dict[str,str]]) -> List[Dict[str,Any]]:
             conf = float(m.get("confidence", 0.5))
             reasoning = str(m.get("reasoning", ""))[:300]
             norm.append({
-                "role_name": role_name, 
-                "confidence": conf, 
+                "role_name": role_name,
+                "confidence": conf,
                 "reasoning": reasoning
             })
         return norm
     except Exception as e:
-        logger.error(f"Role extraction JSON parse error: {e}, raw output: {out if 'out' in locals() else 'No output'}")
-        return []
\ No newline at end of file
+        logger.error(f"Role extraction JSON parse error: {e}, raw output: {out}")
+        return []
+
+def extract_roles(text: Union[str, List[str]], roles: List[Dict[str,str]], use_cache: bool = True) -> List[Dict[str,Any]]:
+    """
+    Определяет подходящие роли для документа на основе его содержания.
+    Весь документ (строка или список страниц) обрабатывается кусками
+    параллельно, результаты объединяются по role_name.
+    """
+    # Подготавливаем список ролей
+    role_lines = [f'{r["name"]} :: {r.get("description", "")}' for r in roles]
+    roles_block = "\n".join(role_lines[:50])  # ограничим количество ролей
+    prompts = [
+        ROLE_SYS_PROMPT
+        + "\n\nRole list:\n"
+        + roles_block
+        + "\n\nRegulatory text fragment:\n"
+        + chunk
+        + "\n\nJSON:"
+        for chunk in chunk_document(text, CHUNK_CHARS)
+    ]
+    if not prompts:
+        return []
+    # повторы при ThrottlingException и темп вызовов — в bedrock_client (rate limiter)
+    outs = chat_many(prompts, max_tokens=600, temperature=0.1, use_cache=use_cache)
+    errors = [o for o in outs if isinstance(o, Exception)]
+    if errors and len(errors) == len(outs):
+        raise errors[0]
+    if errors:
+        logger.warning(f"Role extraction: {len(errors)}/{len(outs)} chunks failed: {str(errors[0])[:200]}")
+    return merge_by_key([_parse_roles(o) for o in outs if not isinstance(o, Exception)], "role_name", "reasoning")
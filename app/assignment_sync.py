@@ -0,0 +1,88 @@
+import os
+import logging
+from typing import Dict, List
+from app.db import get_conn
+from app import requirements_cache
+
+logger = logging.getLogger(__name__)
+
+# Сколько пользователей роли обрабатываем одной транзакцией: большая роль
+# раскладывается на короткие INSERT'ы и не держит блокировки надолго.
+CHUNK_SIZE = int(os.getenv("ASSIGNMENT_SYNC_CHUNK_SIZE", "2000"))
+
+# Требования ролей приходят массивами из requirements_cache (без JOIN с
+# rule_requirements/roles), пользователи выбираются по индексу (role, user_id).
+_PROPAGATE_SQL = """
+    WITH req AS (
+      SELECT *
+      FROM unnest(%(req_roles)s::text[], %(req_courses)s::text[], %(req_days)s::int[])
+           AS rr(role, course_id, due_days)
+    ),
+    chunk AS (
+      SELECT u.user_id, u.role
+      FROM users u
+      WHERE u.role = ANY(%(roles)s::text[])
+        AND u.user_id > %(after)s
+      ORDER BY u.user_id
+      LIMIT %(limit)s
+    ),
+    missing AS (
+      SELECT c.user_id, rr.course_id, CURRENT_DATE + rr.due_days AS due_date
+      FROM chunk c
+      JOIN req rr ON rr.role = c.role
+      WHERE NOT EXISTS (
+        SELECT 1 FROM user_courses uc
+        WHERE uc.user_id = c.user_id AND uc.course_id = rr.course_id
+      )
+    ),
+    ins AS (
+      INSERT INTO assignments (user_id, course_id, status, due_date, assigned_by)
+      SELECT user_id, course_id, 'assigned', due_date, 'system'
+      FROM missing
+      ON CONFLICT (user_id, course_id) DO NOTHING
+      RETURNING 1
+    )
+    SELECT (SELECT MAX(user_id) FROM chunk) AS last_user_id,
+           (SELECT COUNT(*) FROM chunk) AS users,
+           (SELECT COUNT(*) FROM ins) AS inserted
+"""
+
+def propagate_assignments(role_ids: List[int], region: str, chunk_size: int | None = None) -> Dict[str, int]:
+    """
+    Назначает пользователям ролей role_ids все недостающие курсы из
+    rule_requirements (region или без региона, из requirements_cache). Срок — по frequency,
+    уже назначенные и пройденные (user_courses) курсы пропускаются.
+    Пользователи идут порциями по user_id, каждая порция — своя транзакция.
+    """
+    limit = chunk_size or CHUNK_SIZE
+    users = inserted = chunks = 0
+    roles, requirements = requirements_cache.roles_and_requirements(role_ids, region)
+    names = {role_id: name for name, role_id in roles.items()}
+    required = [(names[role_id], course_id, days)
+                for role_id, course_id, days in requirements
+                if role_id in names]
+    if not required:
+        return {"users": 0, "inserted": 0, "chunks": 0}
+    req_roles, req_courses, req_days = (list(col) for col in zip(*required))
+    params = {
+        "req_roles": req_roles, "req_courses": req_courses, "req_days": req_days,
+        "roles": list(dict.fromkeys(req_roles)), "limit": limit,
+    }
+
+    after = ""
+    with get_conn() as conn, conn.cursor() as cur:
+        while True:
+            cur.execute(_PROPAGATE_SQL, {**params, "after": after})
+            row = cur.fetchone()
+            conn.commit()
+            if not row["users"]:
+                break
+            chunks += 1
+            users += row["users"]
+            inserted += row["inserted"]
+            if row["users"] < limit:
+                break
+            after = row["last_user_id"]
+
+    logger.info(f"Assignment fan-out for roles {role_ids} ({region}): {inserted} new for {users} users in {chunks} chunks")
+    return {"users": users, "inserted": inserted, "chunks": chunks}
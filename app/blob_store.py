@@ -0,0 +1,136 @@
+import os
+import time
+import shutil
+import logging
+from typing import Dict
+from app.db import get_conn
+
+logger = logging.getLogger(__name__)
+
+# Контент-адресное хранилище PDF: файл лежит по своему хешу,
+# BLOB_ROOT/ab/cd/abcd....pdf, поэтому одинаковые файлы хранятся один раз,
+# а разные файлы с одинаковым именем не перезаписывают друг друга.
+BLOB_ROOT = os.getenv("BLOB_ROOT", "./data/blobs")
+GC_GRACE_SECONDS = int(os.getenv("BLOB_GC_GRACE_SECONDS", "3600"))  # не трогаем свежие осиротевшие файлы
+
+_UPSERT_SQL = """
+    INSERT INTO blobs (file_hash, path, size_bytes)
+    VALUES (%s, %s, %s)
+    ON CONFLICT (file_hash) DO UPDATE
+      SET path = EXCLUDED.path,
+          size_bytes = EXCLUDED.size_bytes,
+          touched_at = now()
+"""
+
+def blob_path(file_hash: str) -> str:
+    return os.path.join(BLOB_ROOT, file_hash[:2], file_hash[2:4], f"{file_hash}.pdf")
+
+def temp_dir() -> str:
+    """Каталог для недописанных загрузок (та же ФС, что и хранилище, — os.replace атомарен)."""
+    path = os.path.join(BLOB_ROOT, "tmp")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def place_file(src: str, file_hash: str, keep_source: bool = False) -> str:
+    """
+    Кладёт файл в хранилище под его хешем. keep_source=True — исходник
+    остаётся на месте (жёсткая ссылка, иначе копия).
+    """
+    dest = blob_path(file_hash)
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    if not keep_source:
+        os.replace(src, dest)
+        return dest
+    if os.path.exists(dest):
+        return dest
+    tmp = os.path.join(temp_dir(), f"{file_hash}.{os.getpid()}.part")
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dest)
+    os.utime(dest)  # свежий mtime — GC не примет файл за бесхозный до коммита строки
+    return dest
+
+def claim(cur, file_hash: str, size: int | None) -> str:
+    """
+    Регистрирует blob (или обновляет touched_at у существующего) в текущей транзакции.
+    Вызывать ДО place_file: блокировка строки не даёт GC удалить файл,
+    пока документ на него не сослался. ref_count ведёт триггер на documents.
+    """
+    path = blob_path(file_hash)
+    cur.execute(_UPSERT_SQL, (file_hash, path, size))
+    return path
+
+async def aclaim(cur, file_hash: str, size: int | None) -> str:
+    """Async-вариант claim() для курсоров из get_async_conn()."""
+    path = blob_path(file_hash)
+    await cur.execute(_UPSERT_SQL, (file_hash, path, size))
+    return path
+
+def _in_store(path: str) -> bool:
+    root = os.path.realpath(BLOB_ROOT)
+    return os.path.realpath(path).startswith(root + os.sep)
+
+def _unlink(path: str) -> bool:
+    try:
+        os.unlink(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+def collect_garbage(grace_seconds: int | None = None) -> Dict[str, int]:
+    """
+    Удаляет blob'ы без ссылок (ref_count = 0 дольше grace_seconds) вместе с их
+    кэшем текста, а также файлы в хранилище, которых нет в таблице blobs
+    (например, оборванные загрузки). Файлы вне BLOB_ROOT не удаляются.
+    """
+    grace = GC_GRACE_SECONDS if grace_seconds is None else grace_seconds
+    blobs_deleted = files_deleted = 0
+
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT file_hash, path FROM blobs
+            WHERE ref_count <= 0 AND touched_at < now() - make_interval(secs => %s)
+            FOR UPDATE SKIP LOCKED
+            """,
+            (grace,),
+        )
+        orphans = cur.fetchall()
+        hashes = [r["file_hash"] for r in orphans]
+        for r in orphans:
+            if _in_store(r["path"]) and _unlink(r["path"]):
+                files_deleted += 1
+        if hashes:
+            cur.execute("DELETE FROM doc_page_text WHERE file_hash = ANY(%s)", (hashes,))
+            cur.execute("DELETE FROM blobs WHERE file_hash = ANY(%s)", (hashes,))
+            blobs_deleted = cur.rowcount
+
+    # файлы на диске без строки в blobs
+    cutoff = time.time() - grace
+    candidates: Dict[str, str] = {}
+    stray = []
+    for dirpath, _, filenames in os.walk(BLOB_ROOT):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            try:
+                if os.path.getmtime(path) >= cutoff:
+                    continue
+            except FileNotFoundError:
+                continue
+            if name.endswith(".part"):
+                stray.append(path)
+            elif name.endswith(".pdf"):
+                candidates[name[:-4]] = path
+    if candidates:
+        with get_conn() as conn, conn.cursor() as cur:
+            cur.execute("SELECT file_hash FROM blobs WHERE file_hash = ANY(%s)", (list(candidates),))
+            known = {r["file_hash"] for r in cur.fetchall()}
+        stray.extend(p for h, p in candidates.items() if h not in known)
+    for path in stray:
+        if _unlink(path):
+            files_deleted += 1
+
+    logger.info(f"Blob GC: {blobs_deleted} blobs, {files_deleted} files removed")
+    return {"blobs_deleted": blobs_deleted, "files_deleted": files_deleted}
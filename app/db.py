@@ -1,16 +1,133 @@
 from dotenv import load_dotenv
 load_dotenv()
 import os
-import psycopg
+import asyncio
+import threading
+from contextlib import asynccontextmanager
 from psycopg.rows import dict_row
+from psycopg_pool import ConnectionPool, AsyncConnectionPool
 
 def _env_nonempty(name: str) -> str | None:
     v = os.getenv(name)
     return v if v and v.strip() else None
 
+def _env_float(name: str, default: float) -> float:
+    v = _env_nonempty(name)
+    return float(v) if v else default
+
 DSN = _env_nonempty("DATABASE_DSN") or _env_nonempty("PSQL_URL")
 
+# Настройки пула (все можно переопределить через окружение)
+POOL_MIN_SIZE = int(_env_float("DB_POOL_MIN_SIZE", 2))
+POOL_MAX_SIZE = int(_env_float("DB_POOL_MAX_SIZE", 10))
+POOL_TIMEOUT = _env_float("DB_POOL_TIMEOUT", 30.0)         # сколько ждать свободное соединение, сек
+POOL_MAX_IDLE = _env_float("DB_POOL_MAX_IDLE", 300.0)      # закрывать простаивающие дольше, сек
+POOL_MAX_LIFETIME = _env_float("DB_POOL_MAX_LIFETIME", 1800.0)  # пересоздавать соединения старше, сек
+
+_pool: ConnectionPool | None = None
+_pool_lock = threading.Lock()
+
+_async_pool: AsyncConnectionPool | None = None
+_async_pool_lock: asyncio.Lock | None = None
+
+def get_pool() -> ConnectionPool:
+    """
+    Ленивое создание общего пула соединений (один на процесс).
+    Соединение проверяется перед выдачей (check_connection), чтобы
+    не отдавать обработчику "мёртвый" сокет после рестарта Postgres.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                if not DSN:
+                    raise RuntimeError("DATABASE_DSN is not set or empty")
+                _pool = ConnectionPool(
+                    DSN,
+                    kwargs={"row_factory": dict_row},
+                    min_size=POOL_MIN_SIZE,
+                    max_size=max(POOL_MIN_SIZE, POOL_MAX_SIZE),
+                    timeout=POOL_TIMEOUT,
+                    max_idle=POOL_MAX_IDLE,
+                    max_lifetime=POOL_MAX_LIFETIME,
+                    check=ConnectionPool.check_connection,
+                    name="ehs-mentor",
+                    open=True,
+                )
+    return _pool
+
 def get_conn():
-    if not DSN:
-        raise RuntimeError("DATABASE_DSN is not set or empty")
-    return psycopg.connect(DSN, row_factory=dict_row)
+    """
+    Берёт соединение из пула. Использовать как контекстный менеджер:
+
+        with get_conn() as conn, conn.cursor() as cur:
+            ...
+
+    На выходе транзакция коммитится (или откатывается при исключении),
+    а соединение возвращается в пул, а не закрывается.
+    """
+    return get_pool().connection()
+
+async def get_async_pool() -> AsyncConnectionPool:
+    """
+    Асинхронный пул для async-обработчиков FastAPI. Создаётся лениво
+    внутри работающего event loop (один на процесс/loop).
+    """
+    global _async_pool, _async_pool_lock
+    if _async_pool is None:
+        if _async_pool_lock is None:
+            _async_pool_lock = asyncio.Lock()
+        async with _async_pool_lock:
+            if _async_pool is None:
+                if not DSN:
+                    raise RuntimeError("DATABASE_DSN is not set or empty")
+                pool = AsyncConnectionPool(
+                    DSN,
+                    kwargs={"row_factory": dict_row},
+                    min_size=POOL_MIN_SIZE,
+                    max_size=max(POOL_MIN_SIZE, POOL_MAX_SIZE),
+                    timeout=POOL_TIMEOUT,
+                    max_idle=POOL_MAX_IDLE,
+                    max_lifetime=POOL_MAX_LIFETIME,
+                    check=AsyncConnectionPool.check_connection,
+                    name="ehs-mentor-async",
+                    open=False,
+                )
+                await pool.open()
+                _async_pool = pool
+    return _async_pool
+
+@asynccontextmanager
+async def get_async_conn():
+    """
+    Async-вариант get_conn():
+
+        async with get_async_conn() as conn, conn.cursor() as cur:
+            await cur.execute(...)
+            rows = await cur.fetchall()
+    """
+    pool = await get_async_pool()
+    async with pool.connection() as conn:
+        yield conn
+
+def pool_stats() -> dict:
+    """Текущая статистика пулов (пустой dict, если пулы ещё не созданы)."""
+    stats = {}
+    if _pool is not None:
+        stats["sync"] = _pool.get_stats()
+    if _async_pool is not None:
+        stats["async"] = _async_pool.get_stats()
+    return stats
+
+def close_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+async def close_async_pool() -> None:
+    global _async_pool
+    if _async_pool is not None:
+        pool, _async_pool = _async_pool, None
+        await pool.close()
@@ -0,0 +1,194 @@
+import os
+import time
+import random
+import socket
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+from psycopg.types.json import Jsonb
+from app.db import get_conn
+
+logger = logging.getLogger(__name__)
+
+# Фоновые задачи в таблице jobs. Воркеры (потоки в API или отдельный run_worker.py)
+# забирают задачи через FOR UPDATE SKIP LOCKED, поэтому их можно запускать сколько угодно.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))                  # потоков-воркеров на процесс (0 = не запускать)
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "2"))    # сек между опросами пустой очереди
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "900"))    # running дольше — воркер умер, задачу забираем снова
+JOB_BACKOFF_BASE = float(os.getenv("JOB_BACKOFF_BASE", "10"))     # сек, удваивается с каждой попыткой
+JOB_BACKOFF_MAX = float(os.getenv("JOB_BACKOFF_MAX", "600"))
+
+Handler = Callable[[Dict[str, Any]], Dict[str, Any]]
+_handlers: Dict[str, Handler] = {}
+
+_wakeup = threading.Event()
+_stop = threading.Event()
+_threads: List[threading.Thread] = []
+
+def register_handler(kind: str, handler: Handler) -> None:
+    _handlers[kind] = handler
+
+def enqueue(kind: str, payload: Dict[str, Any], max_attempts: int | None = None) -> int:
+    if kind not in _handlers:
+        raise ValueError(f"Unknown job kind: {kind}")
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO jobs (kind, payload, max_attempts)
+            VALUES (%s, %s, COALESCE(%s, 5))
+            RETURNING job_id
+            """,
+            (kind, Jsonb(payload), max_attempts),
+        )
+        job_id = cur.fetchone()["job_id"]
+    _wakeup.set()
+    return job_id
+
+def get_job(job_id: int) -> Optional[Dict[str, Any]]:
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT job_id, kind, status, attempts, max_attempts, run_after, error,
+                   result, created_at, updated_at, finished_at
+            FROM jobs WHERE job_id=%s
+            """,
+            (job_id,),
+        )
+        return cur.fetchone()
+
+def claim_next(worker_id: str) -> Optional[Dict[str, Any]]:
+    """Забирает одну готовую задачу (или задачу с истёкшей арендой)."""
+    with get_conn() as conn, conn.cursor() as cur:
+        # аренда истекла, а попытки кончились — задача, скорее всего, роняет воркер; не берём её снова
+        cur.execute(
+            """
+            UPDATE jobs
+            SET status='failed',
+                error=COALESCE(error || E'\\n', '') || 'Lease expired on the last attempt (worker died?)',
+                locked_by=NULL, locked_at=NULL, updated_at=now(), finished_at=now()
+            WHERE status = 'running'
+              AND locked_at < now() - make_interval(secs => %(lease)s)
+              AND attempts >= max_attempts
+            RETURNING job_id, kind, attempts
+            """,
+            {"lease": JOB_LEASE_SECONDS},
+        )
+        for job in cur.fetchall():
+            logger.error(f"Job {job['job_id']} ({job['kind']}) failed permanently: lease expired after {job['attempts']} attempts")
+        cur.execute(
+            """
+            UPDATE jobs
+            SET status='running', attempts=attempts + 1,
+                locked_by=%(worker)s, locked_at=now(), updated_at=now()
+            WHERE job_id = (
+              SELECT job_id FROM jobs
+              WHERE (status = 'queued' AND run_after <= now())
+                 OR (status = 'running' AND locked_at < now() - make_interval(secs => %(lease)s)
+                     AND attempts < max_attempts)
+              ORDER BY run_after, job_id
+              FOR UPDATE SKIP LOCKED
+              LIMIT 1
+            )
+            RETURNING job_id, kind, payload, attempts, max_attempts, locked_by
+            """,
+            {"worker": worker_id, "lease": JOB_LEASE_SECONDS},
+        )
+        return cur.fetchone()
+
+def _lease_lost(job: Dict[str, Any]) -> None:
+    # аренда истекла и задачу забрал другой воркер — его результат не перетираем
+    logger.warning(f"Job {job['job_id']} ({job['kind']}) lease lost by {job['locked_by']}, result discarded")
+
+def _complete(job: Dict[str, Any], result: Dict[str, Any]) -> bool:
+    """False — аренду уже забрал другой воркер, запись не изменена."""
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE jobs
+            SET status='succeeded', result=%s, error=NULL,
+                locked_by=NULL, locked_at=NULL, updated_at=now(), finished_at=now()
+            WHERE job_id=%s AND locked_by=%s
+            """,
+            (Jsonb(result), job["job_id"], job["locked_by"]),
+        )
+        updated = cur.rowcount
+    if not updated:
+        _lease_lost(job)
+    return bool(updated)
+
+def _fail(job: Dict[str, Any], error: str, retryable: bool) -> bool:
+    """False — аренду уже забрал другой воркер, запись не изменена."""
+    final = not retryable or job["attempts"] >= job["max_attempts"]
+    delay = min(JOB_BACKOFF_MAX, JOB_BACKOFF_BASE * 2 ** (job["attempts"] - 1)) * random.uniform(0.8, 1.2)
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE jobs
+            SET status = CASE WHEN %(final)s THEN 'failed' ELSE 'queued' END,
+                run_after = now() + make_interval(secs => %(delay)s),
+                error=%(error)s, locked_by=NULL, locked_at=NULL, updated_at=now(),
+                finished_at = CASE WHEN %(final)s THEN now() END
+            WHERE job_id=%(job_id)s AND locked_by=%(worker)s
+            """,
+            {"final": final, "delay": delay, "error": error[:2000], "job_id": job["job_id"], "worker": job["locked_by"]},
+        )
+        updated = cur.rowcount
+    if not updated:
+        _lease_lost(job)
+        return False
+    if final:
+        logger.error(f"Job {job['job_id']} ({job['kind']}) failed permanently: {error[:200]}")
+    else:
+        logger.warning(f"Job {job['job_id']} ({job['kind']}) failed, retry in {delay:.0f}s: {error[:200]}")
+    return True
+
+def run_one(worker_id: str) -> bool:
+    """Выполняет одну задачу. False — очередь пуста."""
+    job = claim_next(worker_id)
+    if not job:
+        return False
+    handler = _handlers.get(job["kind"])
+    if handler is None:
+        _fail(job, f"No handler for job kind {job['kind']!r}", retryable=False)
+        return True
+    logger.info(f"Job {job['job_id']} ({job['kind']}) started by {worker_id}, attempt {job['attempts']}")
+    try:
+        result = handler(job["payload"])
+    except Exception as e:
+        # ошибки клиента (HTTPException 4xx: документ не найден, плохой PDF) не повторяем
+        status = getattr(e, "status_code", 500)
+        detail = getattr(e, "detail", None) or str(e)
+        _fail(job, f"{type(e).__name__}: {detail}", retryable=status >= 500)
+        return True
+    if _complete(job, result):
+        logger.info(f"Job {job['job_id']} ({job['kind']}) succeeded")
+    return True
+
+def _worker_loop(worker_id: str) -> None:
+    while not _stop.is_set():
+        try:
+            if run_one(worker_id):
+                continue
+        except Exception as e:
+            logger.error(f"Job worker {worker_id} error: {e}")
+        _wakeup.wait(JOB_POLL_INTERVAL)
+        _wakeup.clear()
+
+def start_workers(count: int | None = None) -> None:
+    n = JOB_WORKERS if count is None else count
+    _stop.clear()
+    prefix = f"{socket.gethostname()}:{os.getpid()}"
+    for i in range(n):
+        t = threading.Thread(target=_worker_loop, args=(f"{prefix}:{i}",), name=f"job-worker-{i}", daemon=True)
+        t.start()
+        _threads.append(t)
+    if n:
+        logger.info(f"Started {n} job workers")
+
+def stop_workers(timeout: float = 10.0) -> None:
+    _stop.set()
+    _wakeup.set()
+    deadline = time.monotonic() + timeout
+    for t in _threads:
+        t.join(max(0.0, deadline - time.monotonic()))
+    _threads.clear()
@@ -2,20 +2,39 @@ from dotenv import load_dotenv
 load_dotenv()
 
 import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
-from app.routers import recommend, assignments, chat, documents, upload, stats, reports, admin
-from app.db import get_conn
+from app.routers import recommend, assignments, chat, documents, upload, stats, reports, admin, jobs
+from app.db import get_conn, get_pool, get_async_pool, pool_stats, close_pool, close_async_pool
+from app.pdf_text import shutdown_extractor
+from app.jobs import start_workers, stop_workers
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Прогреваем пулы соединений при старте, закрываем при остановке
+    try:
+        get_pool()
+        await get_async_pool()
+    except Exception as e:
+        logger.error(f"DB pool init failed: {e}")
+    start_workers()
+    yield
+    stop_workers()
+    shutdown_extractor()
+    await close_async_pool()
+    close_pool()
+
 app = FastAPI(
     title="EHS Mentor",
     description="Database-first API for EHS training assignments",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS для фронтенда
@@ -49,7 +68,8 @@ def health():
             "status": "ok", 
             "database": "connected",
             "bedrock_model_id": repr(os.getenv('BEDROCK_MODEL_ID')),
-            "aws_region": repr(os.getenv('AWS_REGION'))
+            "aws_region": repr(os.getenv('AWS_REGION')),
+            "db_pool": pool_stats(),
         }
     except Exception as e:
         logger.error(f"Health check failed: {e}")
@@ -63,3 +83,4 @@ app.include_router(upload.router, prefix="/api")
 app.include_router(stats.router, prefix="/api")
 app.include_router(reports.router, prefix="/api")
 app.include_router(admin.router, prefix="/api")
+app.include_router(jobs.router, prefix="/api")
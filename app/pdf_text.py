@@ -0,0 +1,203 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+import multiprocessing
+from multiprocessing.pool import Pool
+from typing import List, Optional
+from app.db import get_conn
+from app import pdf_worker
+
+logger = logging.getLogger(__name__)
+
+# Разбор PDF (pypdf, чистый Python) идёт в отдельном пуле процессов:
+# не держит GIL обработчиков, ограничен по времени и памяти.
+EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", "2"))
+EXTRACT_TIMEOUT = float(os.getenv("PDF_EXTRACT_TIMEOUT", "120"))        # сек на документ
+EXTRACT_MEMORY_MB = int(os.getenv("PDF_EXTRACT_MEMORY_MB", "1024"))     # лимит адресного пространства процесса
+PAGES_PER_TASK = int(os.getenv("PDF_EXTRACT_PAGES_PER_TASK", "25"))     # страниц на задачу для больших файлов
+MAX_TASKS_PER_WORKER = 50  # процессы периодически пересоздаются, чтобы не копить память
+
+class PdfTextError(Exception):
+    """PDF не удалось прочитать."""
+
+class PdfEncryptedError(PdfTextError):
+    """Зашифрованные PDF не поддерживаются."""
+
+class PdfTimeoutError(PdfTextError):
+    """Разбор PDF не уложился в PDF_EXTRACT_TIMEOUT."""
+
+class _PoolRestarted(Exception):
+    pass
+
+_pool: Pool | None = None
+_pool_lock = threading.Lock()
+
+def _get_pool() -> Pool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, а не fork: родитель многопоточный (uvicorn, пул соединений)
+            ctx = multiprocessing.get_context("spawn")
+            _pool = ctx.Pool(
+                processes=max(1, EXTRACT_WORKERS),
+                initializer=pdf_worker.init_worker,
+                initargs=(EXTRACT_MEMORY_MB,),
+                maxtasksperchild=MAX_TASKS_PER_WORKER,
+            )
+        return _pool
+
+def _restart_pool(broken: Pool) -> None:
+    """Убивает процессы зависшего пула; следующий вызов создаст новый."""
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    broken.terminate()
+
+def shutdown_extractor() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.terminate()
+
+def _wait(pool: Pool, result, deadline: float):
+    # Ждём короткими интервалами, чтобы заметить перезапуск пула другим запросом
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise multiprocessing.TimeoutError()
+        try:
+            return result.get(min(remaining, 0.5))
+        except multiprocessing.TimeoutError:
+            if pool is not _pool:
+                raise _PoolRestarted()
+
+def _extract_in_pool(path: str, deadline: float) -> List[str]:
+    pool = _get_pool()
+    try:
+        total, pages = _wait(pool, pool.apply_async(pdf_worker.extract_head, (path, PAGES_PER_TASK)), deadline)
+        # большие файлы — параллельно по диапазонам страниц
+        parts = [
+            pool.apply_async(pdf_worker.extract_range, (path, start, min(start + PAGES_PER_TASK, total)))
+            for start in range(len(pages), total, PAGES_PER_TASK)
+        ]
+        for part in parts:
+            pages.extend(_wait(pool, part, deadline))
+        return pages
+    except multiprocessing.TimeoutError:
+        logger.error(f"PDF extraction timed out for {path}, restarting extractor pool")
+        _restart_pool(pool)
+        raise
+    except ValueError:
+        # "Pool not running": пул завершил таймаут другого запроса между _get_pool и apply_async.
+        # ValueError из самого разбора (пул тот же) пробрасываем как есть.
+        if pool is not _pool:
+            raise _PoolRestarted()
+        raise
+
+def file_md5(path: str) -> str:
+    """MD5 файла по кускам (тот же алгоритм, что и при загрузке в upload.py)."""
+    h = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def extract_pages(path: str, timeout: float | None = None) -> List[str]:
+    """
+    Полный разбор PDF в пуле процессов: текст каждой страницы по порядку.
+    Зависший или слишком тяжёлый файл прерывается по таймауту.
+    """
+    limit = timeout or EXTRACT_TIMEOUT
+    deadline = time.monotonic() + limit
+    for attempt in range(2):
+        try:
+            return _extract_in_pool(path, deadline)
+        except multiprocessing.TimeoutError:
+            raise PdfTimeoutError(f"PDF extraction exceeded {limit:.0f}s")
+        except _PoolRestarted:
+            # пул убил чужой зависший документ — наш запрос повторяем один раз
+            if attempt:
+                raise PdfTextError("PDF extractor restarted, try again")
+        except pdf_worker.EncryptedPdf as e:
+            raise PdfEncryptedError(str(e)) from e
+        except MemoryError as e:
+            raise PdfTextError(f"PDF extraction exceeded {EXTRACT_MEMORY_MB} MB memory limit") from e
+
+# PDF без страниц помечается строкой с page_number = 0, иначе его нельзя
+# отличить от ещё не разобранного и он разбирался бы на каждом вызове
+_EMPTY_MARKER_PAGE = 0
+
+def load_pages(file_hash: str) -> Optional[List[str]]:
+    """Текст страниц из doc_page_text; [] — файл разобран, страниц нет; None — ещё не разбирался."""
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(
+            "SELECT page_number, text FROM doc_page_text WHERE file_hash=%s ORDER BY page_number",
+            (file_hash,),
+        )
+        rows = cur.fetchall()
+    if not rows:
+        return None
+    return [r["text"] for r in rows if r["page_number"] != _EMPTY_MARKER_PAGE]
+
+def store_pages(file_hash: str, pages: List[str]) -> None:
+    # Postgres не хранит \x00 в text — вычищаем
+    rows = [(file_hash, i + 1, t.replace("\x00", "")) for i, t in enumerate(pages)]
+    if not rows:
+        rows = [(file_hash, _EMPTY_MARKER_PAGE, "")]
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.executemany(
+            """
+            INSERT INTO doc_page_text (file_hash, page_number, text)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (file_hash, page_number) DO NOTHING
+            """,
+            rows,
+        )
+
+def ensure_pages(file_hash: str, path: str) -> List[str]:
+    """
+    Возвращает текст страниц файла: из кэша, а при промахе — разбирает PDF
+    и сохраняет результат. Повторный разбор нужен только для нового хеша.
+    """
+    pages = load_pages(file_hash)
+    if pages is not None:
+        return pages
+    logger.info(f"Extracting PDF text for {path} (hash {file_hash})")
+    try:
+        pages = extract_pages(path)
+    except PdfTextError:
+        raise
+    except Exception as e:
+        raise PdfTextError(str(e)) from e
+    store_pages(file_hash, pages)
+    return pages
+
+def document_pages(doc_id: int) -> Optional[List[str]]:
+    """
+    Текст страниц документа по doc_id; None — если документа нет.
+    Для старых записей без file_hash хеш считается один раз и сохраняется.
+    """
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("SELECT path, file_hash FROM documents WHERE doc_id=%s", (doc_id,))
+        row = cur.fetchone()
+    if not row:
+        return None
+
+    path = row["path"]
+    file_hash = row["file_hash"]
+    if not file_hash:
+        try:
+            file_hash = file_md5(path)
+        except OSError as e:
+            raise PdfTextError(str(e)) from e
+        with get_conn() as conn, conn.cursor() as cur:
+            cur.execute("UPDATE documents SET file_hash=%s WHERE doc_id=%s", (file_hash, doc_id))
+    return ensure_pages(file_hash, path)
+
+def join_pages(pages: List[str], pages_limit: Optional[int] = None) -> str:
+    """Склеивает первые pages_limit страниц (None = все) так же, как раньше в роутерах."""
+    return "\n".join(pages[: (pages_limit or len(pages))])
@@ -0,0 +1,36 @@
+"""
+Код, который выполняется внутри процессов пула разбора PDF (см. app/pdf_text.py).
+Модуль намеренно лёгкий: дочерние процессы импортируют только pypdf.
+"""
+from typing import List, Optional, Tuple
+from pypdf import PdfReader
+
+class EncryptedPdf(Exception):
+    pass
+
+def init_worker(memory_mb: int) -> None:
+    """Инициализатор процесса: ограничиваем адресное пространство (где поддерживается)."""
+    if memory_mb <= 0:
+        return
+    try:
+        import resource
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, ValueError, OSError):
+        pass
+
+def _open(path: str) -> PdfReader:
+    reader = PdfReader(path)
+    if reader.is_encrypted:
+        raise EncryptedPdf("Encrypted PDFs not supported")
+    return reader
+
+def extract_head(path: str, count: int) -> Tuple[int, List[str]]:
+    """Число страниц и текст первых count страниц (маленькие файлы — за один вызов)."""
+    reader = _open(path)
+    return len(reader.pages), [(p.extract_text() or "") for p in reader.pages[:count]]
+
+def extract_range(path: str, start: int, end: Optional[int]) -> List[str]:
+    """Текст страниц [start, end)."""
+    reader = _open(path)
+    return [(p.extract_text() or "") for p in reader.pages[start:end]]
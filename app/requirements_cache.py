@@ -0,0 +1,147 @@
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+import psycopg
+from app.db import DSN, get_conn
+
+logger = logging.getLogger(__name__)
+
+# Роли и требования rule_requirements в памяти процесса. Меняются несколько раз
+# в месяц, а читаются на каждом документе и при каждой раскладке назначений.
+# Триггеры (миграция 0016) шлют NOTIFY в канал CHANNEL на любое изменение
+# roles / rule_requirements; фоновый поток слушает канал и сбрасывает кэш.
+# Пока слушатель не подключён, кэшу не доверяем и читаем из БД на каждый вызов.
+CHANNEL = "rule_requirements"
+RECONNECT_SECONDS = 5.0
+HEALTHCHECK_SECONDS = 60.0   # как часто проверять, что соединение слушателя живо
+
+_lock = threading.Lock()
+_generation = 0              # увеличивается на каждое уведомление
+_snapshot: Optional[Dict[str, Any]] = None
+_listening = False
+_listener: Optional[threading.Thread] = None
+_stats: Dict[str, int] = {"hits": 0, "loads": 0, "invalidations": 0, "reconnects": 0}
+
+def _due_days(frequency: Optional[str]) -> int:
+    return 1095 if frequency == "every_3_years" else 365
+
+def _load() -> Dict[str, Any]:
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("SELECT role_id, name FROM roles ORDER BY role_id")
+        roles = {r["name"]: r["role_id"] for r in cur.fetchall()}
+        cur.execute(
+            """
+            SELECT role_id, course_id, frequency, COALESCE(region, '') AS region
+            FROM rule_requirements
+            WHERE COALESCE(active, TRUE)
+            """
+        )
+        rules = cur.fetchall()
+    # (role_id, region) -> {course_id: дни}; region '' = требование без региона
+    by_role: Dict[Tuple[int, str], Dict[str, int]] = {}
+    for r in rules:
+        courses = by_role.setdefault((r["role_id"], r["region"]), {})
+        days = _due_days(r["frequency"])
+        courses[r["course_id"]] = min(days, courses.get(r["course_id"], days))
+    with _lock:
+        _stats["loads"] += 1
+    return {"roles": roles, "requirements": by_role, "loaded_at": time.time()}
+
+def _listen_forever() -> None:
+    global _listening
+    while True:
+        try:
+            with psycopg.connect(DSN, autocommit=True) as conn:
+                conn.execute(f"LISTEN {CHANNEL}")
+                # всё, что поменялось, пока слушателя не было, — мимо нас
+                invalidate()
+                _listening = True
+                logger.info(f"Listening for {CHANNEL} notifications")
+                while True:
+                    for _ in conn.notifies(timeout=HEALTHCHECK_SECONDS):
+                        invalidate()
+                    conn.execute("SELECT 1")
+        except Exception as e:
+            logger.warning(f"Requirements cache listener disconnected: {e}")
+        _listening = False
+        invalidate()
+        with _lock:
+            _stats["reconnects"] += 1
+        time.sleep(RECONNECT_SECONDS)
+
+def _ensure_listener() -> None:
+    global _listener
+    if _listener is None and DSN:
+        with _lock:
+            if _listener is None:
+                _listener = threading.Thread(target=_listen_forever, name="requirements-cache-listener", daemon=True)
+                _listener.start()
+
+def _current() -> Dict[str, Any]:
+    _ensure_listener()
+    with _lock:
+        snapshot, generation = _snapshot, _generation
+    if snapshot is not None and _listening:
+        with _lock:
+            _stats["hits"] += 1
+        return snapshot
+    fresh = _load()
+    _store(fresh, generation)
+    return fresh
+
+def _store(snapshot: Dict[str, Any], generation: int) -> None:
+    global _snapshot
+    with _lock:
+        # если во время загрузки пришло уведомление, снимок уже устарел
+        if _listening and generation == _generation:
+            _snapshot = snapshot
+
+def invalidate() -> None:
+    """Сбросить кэш (вызывается слушателем; писатель может вызвать сам сразу после commit)."""
+    global _snapshot, _generation
+    with _lock:
+        _snapshot = None
+        _generation += 1
+        _stats["invalidations"] += 1
+
+def roles() -> Dict[str, int]:
+    """name -> role_id."""
+    return _current()["roles"]
+
+def _requirements(by_role: Dict[Tuple[int, str], Dict[str, int]], role_ids: List[int], region: str) -> List[Tuple[int, str, int]]:
+    out = []
+    for role_id in dict.fromkeys(role_ids):
+        courses = dict(by_role.get((role_id, ""), {}))
+        for course_id, days in by_role.get((role_id, region or ""), {}).items():
+            courses[course_id] = min(days, courses.get(course_id, days))
+        out.extend((role_id, course_id, days) for course_id, days in sorted(courses.items()))
+    return out
+
+def requirements(role_ids: List[int], region: str) -> List[Tuple[int, str, int]]:
+    """
+    Требуемые курсы для ролей в регионе (общие + региональные):
+    [(role_id, course_id, срок в днях)]; при нескольких правилах на курс — ближайший срок.
+    """
+    return _requirements(_current()["requirements"], role_ids, region)
+
+def roles_and_requirements(role_ids: List[int], region: str) -> Tuple[Dict[str, int], List[Tuple[int, str, int]]]:
+    """
+    roles() и requirements() из одного снимка: между двумя отдельными вызовами
+    кэш могут сбросить, и роли разойдутся с требованиями.
+    """
+    snapshot = _current()
+    return snapshot["roles"], _requirements(snapshot["requirements"], role_ids, region)
+
+def cache_info() -> Dict[str, Any]:
+    with _lock:
+        snapshot = _snapshot
+        out: Dict[str, Any] = dict(_stats)
+        out["generation"] = _generation
+    out["listening"] = _listening
+    out["cached"] = snapshot is not None
+    if snapshot is not None:
+        out["roles"] = len(snapshot["roles"])
+        out["rules"] = sum(len(c) for c in snapshot["requirements"].values())
+        out["loaded_at"] = snapshot["loaded_at"]
+    return out
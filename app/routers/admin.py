@@ -1,5 +1,12 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
 from app.db import get_conn
+from app import requirements_cache
+from app.blob_store import collect_garbage
+from app.ai import llm_cache, chat_cache
+from app.ai.bedrock_client import limiter_stats
+from app.ai import mapping_rules
+from app.ai.mappers import CompiledMatcher
 
 router = APIRouter()
 
@@ -46,4 +53,107 @@ def cleanup_duplicate_documents():
         "documents_deleted": docs_deleted,
         "mappings_deleted": mappings_deleted,
         "remaining_documents": remaining
-    }
\ No newline at end of file
+    }
+
+@router.post("/admin/gc-blobs")
+def gc_blobs(grace_seconds: int | None = None):
+    # Удаляет файлы хранилища, на которые не ссылается ни один документ
+    return collect_garbage(grace_seconds)
+
+@router.post("/admin/user-required-course/rebuild")
+def rebuild_user_required_course():
+    # Полный пересчёт таблицы пробелов (восстановление, если триггеры были отключены)
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("SELECT user_required_course_rebuild() AS rows")
+        return {"rows": cur.fetchone()["rows"]}
+
+@router.get("/admin/requirements-cache")
+def requirements_cache_stats():
+    # Кэш роль -> требуемые курсы: listening=false — слушатель NOTIFY не подключён, читаем из БД
+    return requirements_cache.cache_info()
+
+@router.get("/admin/llm-cache")
+def llm_cache_stats():
+    # Счётчики попаданий/промахов кэша ответов Bedrock в этом процессе
+    return llm_cache.stats()
+
+@router.get("/admin/chat-cache")
+def chat_cache_stats():
+    # Кэш /chat/reply: hits — из памяти, coalesced — дождались уже идущего вызова
+    return chat_cache.stats()
+
+@router.delete("/admin/chat-cache")
+def chat_cache_clear():
+    return {"cleared": chat_cache.clear()}
+
+@router.get("/admin/bedrock-limiter")
+def bedrock_limiter_stats():
+    # Текущий темп вызовов Bedrock (снижается после ThrottlingException) и время ожидания в очереди
+    return limiter_stats()
+
+class MappingRuleIn(BaseModel):
+    pattern: str             # регулярное выражение, без учёта регистра
+    course_id: str
+    example: str             # фрагмент документа, который правило должно найти
+    weight: float = 1.0
+    region: str | None = None  # None = для всех регионов
+
+@router.get("/admin/mapping-rules")
+def list_mapping_rules():
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("""
+            SELECT rule_id, pattern, course_id, weight, region, active, updated_at
+            FROM mapping_rules ORDER BY rule_id
+        """)
+        rules = cur.fetchall()
+    return {"cache": mapping_rules.cache_info(), "count": len(rules), "rules": rules}
+
+@router.post("/admin/mapping-rules")
+def add_mapping_rule(payload: MappingRuleIn):
+    # в таблицу попадает только правило, которое вместе с действующими правилами
+    # собирается в матчер и находит свой пример: битое или ничего не находящее
+    # правило сломало бы или молча обеднило сопоставление для всех документов
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("SELECT 1 FROM courses WHERE course_id=%s", (payload.course_id,))
+        if cur.fetchone() is None:
+            raise HTTPException(status_code=404, detail="Course not found")
+        cur.execute("SELECT pattern, course_id, weight FROM mapping_rules WHERE active ORDER BY rule_id")
+        existing = [(r["pattern"], r["course_id"], float(r["weight"])) for r in cur.fetchall()]
+        base = CompiledMatcher(existing)
+        matcher = CompiledMatcher(existing + [(payload.pattern, payload.course_id, payload.weight)])
+        if len(matcher.rules) == len(base.rules):
+            raise HTTPException(status_code=400, detail=f"Invalid pattern: {matcher.skipped[-1][2]}")
+        if base.regex is not None and matcher.regex is None:
+            raise HTTPException(status_code=400, detail="Invalid pattern: breaks the combined matcher regex")
+        try:
+            matcher.match(payload.example)
+            hits = matcher.rule_hits(payload.example)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Invalid pattern: matching failed: {e}")
+        if len(matcher.rules) - 1 not in hits:
+            raise HTTPException(status_code=400, detail="Pattern does not match the example")
+        cur.execute(
+            """
+            INSERT INTO mapping_rules (pattern, course_id, weight, region)
+            VALUES (%s, %s, %s, %s)
+            RETURNING rule_id
+            """,
+            (payload.pattern, payload.course_id, payload.weight, payload.region),
+        )
+        rule_id = cur.fetchone()["rule_id"]
+        conn.commit()
+    mapping_rules.invalidate()
+    return {"rule_id": rule_id}
+
+@router.delete("/admin/mapping-rules/{rule_id}")
+def deactivate_mapping_rule(rule_id: int):
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(
+            "UPDATE mapping_rules SET active=FALSE, updated_at=now() WHERE rule_id=%s AND active",
+            (rule_id,),
+        )
+        if cur.rowcount == 0:
+            raise HTTPException(status_code=404, detail="Active rule not found")
+        conn.commit()
+    mapping_rules.invalidate()
+    return {"rule_id": rule_id, "active": False}
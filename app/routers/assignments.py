@@ -3,26 +3,16 @@
 
 from datetime import date, timedelta
 from typing import Optional, List
-import os
-import psycopg
-from psycopg.rows import dict_row
 from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel, Field
+from app.db import get_conn, get_async_conn
 
 router = APIRouter()
 
-# EN: Read DATABASE_DSN from environment (Render External Database URL).
-# RU: Читаем DATABASE_DSN из окружения (External Database URL из Render).
-def _env_nonempty(name: str) -> str | None:
-    v = os.getenv(name)
-    return v if v and v.strip() else None
-
-DSN = _env_nonempty("DATABASE_DSN") or _env_nonempty("PSQL_URL")
-
-def get_conn():
-    if not DSN:
-        raise RuntimeError("DATABASE_DSN is not set or empty")
-    return psycopg.connect(DSN, row_factory=dict_row)
+# EN: Connections are borrowed from the shared pools in app.db (no per-request connect);
+#     read-only endpoints use the async pool and do not occupy a threadpool worker.
+# RU: Соединения берутся из общих пулов app.db (без connect на каждый запрос);
+#     read-only эндпоинты используют async-пул и не занимают поток threadpool.
 
 # ─────────────────────────────────────────────────────────────────────
 # EN: Pydantic models
@@ -92,7 +82,7 @@ def create_assignment(payload: AssignmentIn):
 # RU: Список назначений по user_id (POST-тело { "user_id": "..." })
 # ─────────────────────────────────────────────────────────────────────
 @router.get("/assignments/list", response_model=AssignmentListResp)
-def list_assignments(user_id: str = Query(...)):
+async def list_assignments(user_id: str = Query(...)):
     if not user_id:
         raise HTTPException(status_code=400, detail="user_id is required")
 
@@ -123,15 +113,15 @@ def list_assignments(user_id: str = Query(...)):
     """
     rows = []
     try:
-        with get_conn() as conn, conn.cursor() as cur:
-            cur.execute(sql_join, (user_id,))
-            rows = cur.fetchall()
+        async with get_async_conn() as conn, conn.cursor() as cur:
+            await cur.execute(sql_join, (user_id,))
+            rows = await cur.fetchall()
     except Exception:
         # EN: Join failed (no courses table or columns). Fallback to basic.
         # RU: Джоин не сработал (нет таблицы/колонок). Идём по базовому запросу.
-        with get_conn() as conn, conn.cursor() as cur:
-            cur.execute(sql_basic, (user_id,))
-            rows = cur.fetchall()
+        async with get_async_conn() as conn, conn.cursor() as cur:
+            await cur.execute(sql_basic, (user_id,))
+            rows = await cur.fetchall()
 
     items = [AssignmentOut(**r) for r in rows]
     return AssignmentListResp(user_id=user_id, count=len(items), items=items)
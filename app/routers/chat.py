@@ -1,6 +1,12 @@
+import json
+import logging
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from app.ai.bedrock_client import chat as bedrock_chat
+from app.ai import chat_cache
+from app.ai.bedrock_client import MODEL_ID, achat, astream_chat
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -8,9 +14,35 @@ class ChatIn(BaseModel):
     message: str
 
 @router.post("/chat/reply")
-def chat_reply(payload: ChatIn):
+async def chat_reply(payload: ChatIn):
     try:
-        reply = bedrock_chat(payload.message)
+        # свободный диалог не кэшируем в llm_cache (он для повторной обработки документов);
+        # повторяющиеся вопросы отвечаются из короткого кэша в памяти
+        key = chat_cache.cache_key(payload.message, MODEL_ID)
+        reply = await chat_cache.get_or_call(key, lambda: achat(payload.message, use_cache=False))
         return {"reply": reply}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.post("/chat/stream")
+async def chat_stream(payload: ChatIn):
+    # Тот же диалог, но текст идёт клиенту по мере генерации (Server-Sent Events):
+    # event: token {"text": ...} ... event: done {} | event: error {"detail": ...}.
+    # При отключении клиента Starlette отменяет генератор, и astream_chat закрывает upstream.
+    async def events():
+        try:
+            async for piece in astream_chat(payload.message):
+                yield _sse("token", {"text": piece})
+            yield _sse("done", {})
+        except Exception as e:
+            logger.error(f"Chat stream failed: {str(e)[:200]}")
+            yield _sse("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
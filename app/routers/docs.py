@@ -1,12 +1,15 @@
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from pathlib import Path
-from typing import Optional, List
+from typing import Optional, List, Dict, Tuple
+from collections import Counter, defaultdict
 from pypdf import PdfReader
 import hashlib
+import re
 
 from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy import select, func, literal_column
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from app.db import get_db
 from app.models import Document, DocPage, DocCourseMap  # предполагается, что есть таблицы documents, doc_pages, doc_course_map
 # Если у тебя класс Course в другом модуле — проверь импорт:
@@ -123,13 +126,33 @@ class MapPayload(BaseModel):
     doc_id: int
     min_confidence: float = 0.25
 
+_TOKEN_RE = re.compile(r"[A-Za-z0-9\-+/]+")
+
 def _tokenize(name: str) -> List[str]:
-    import re
-    return re.findall(r"[A-Za-z0-9\-+/]+", name.lower())
+    return _TOKEN_RE.findall(name.lower())
+
+def _score_catalog(pages: List[str], courses: List[Tuple[str, str]]) -> Dict[str, float]:
+    """
+    Скоринг всего каталога за один проход по документу: текст токенизируется
+    один раз в частотный индекс, токены курсов идут через обратный индекс
+    token -> курсы, так что стоимость ~ размер документа + размер каталога.
+    """
+    doc_index: Counter = Counter()
+    for page in pages:
+        doc_index.update(_tokenize(page))
 
-def _score_course(text: str, tokens: List[str]) -> float:
-    hits = sum(text.count(tok) for tok in tokens if len(tok) > 2)
-    return min(1.0, hits / 10.0)
+    by_token: Dict[str, List[str]] = defaultdict(list)
+    for c_id, c_name in courses:
+        for tok in _tokenize(c_name):
+            if len(tok) > 2:
+                by_token[tok].append(c_id)
+
+    hits: Dict[str, int] = defaultdict(int)
+    for tok in by_token.keys() & doc_index.keys():
+        n = doc_index[tok]
+        for c_id in by_token[tok]:
+            hits[c_id] += n
+    return {c_id: min(1.0, h / 10.0) for c_id, h in hits.items()}
 
 @router.post("/map")
 def map_doc(payload: MapPayload, db: Session = Depends(get_db)):
@@ -141,31 +164,25 @@ def map_doc(payload: MapPayload, db: Session = Depends(get_db)):
     pages = db.execute(
         select(DocPage.text).where(DocPage.doc_id == doc.id).order_by(DocPage.page_number)
     ).scalars().all()
-    joined = " ".join(pages).lower()
 
     courses = db.execute(select(Course.id, Course.name)).all()
-    created = 0
-    for c_id, c_name in courses:
-        tokens = _tokenize(c_name)
-        conf = _score_course(joined, tokens)
-        if conf >= payload.min_confidence:
-            existing = db.execute(
-                select(DocCourseMap).where(
-                    DocCourseMap.doc_id == doc.id,
-                    DocCourseMap.course_id == c_id
-                )
-            ).scalar_one_or_none()
-            if existing:
-                if (existing.confidence or 0) < conf:
-                    existing.confidence = conf
-                    existing.method = "heuristic"
-            else:
-                db.add(DocCourseMap(
-                    doc_id=doc.id,
-                    course_id=c_id,
-                    method="heuristic",
-                    confidence=conf
-                ))
-                created += 1
+    scores = _score_catalog([p or "" for p in pages], courses)
+    rows = [
+        {"doc_id": doc.id, "course_id": c_id, "method": "heuristic", "confidence": conf}
+        for c_id, conf in scores.items()
+        if conf >= payload.min_confidence
+    ]
+    if not rows:
+        return {"mapped_created": 0}
+
+    # один upsert на все курсы: новые строки вставляются, у существующих
+    # поднимается confidence, если эвристика дала больше
+    stmt = pg_insert(DocCourseMap).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DocCourseMap.doc_id, DocCourseMap.course_id],
+        set_={"confidence": stmt.excluded.confidence, "method": stmt.excluded.method},
+        where=func.coalesce(DocCourseMap.confidence, 0) < stmt.excluded.confidence,
+    ).returning(literal_column("xmax = 0").label("inserted"))
+    created = sum(1 for (inserted,) in db.execute(stmt) if inserted)
     db.commit()
     return {"mapped_created": created}
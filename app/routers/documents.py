@@ -1,17 +1,27 @@
 import os
 import logging
-from fastapi import APIRouter, HTTPException
+from typing import List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
-from pypdf import PdfReader
-from app.db import get_conn
-from app.ai.mappers import map_text_to_courses
+from app.db import get_conn, get_async_conn
+from app import blob_store, requirements_cache
+from app.pdf_text import (
+    PdfTextError, PdfEncryptedError, PdfTimeoutError, file_md5, ensure_pages, document_pages, join_pages,
+)
+from app.ai.mapping_rules import map_text_to_courses
 from app.ai.extractor import extract_courses
 from app.ai.role_extractor import extract_roles
+from app.jobs import register_handler
+from app.assignment_sync import propagate_assignments
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Потоки для параллельных вызовов LLM внутри одного документа
+_ai_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="ai-extract")
+
 class RegisterDoc(BaseModel):
     source: str
     title: str
@@ -23,62 +33,175 @@ def register_document(payload: RegisterDoc):
     if not os.path.exists(path):
         raise HTTPException(status_code=400, detail=f"File not found: {path}")
     try:
-        reader = PdfReader(path)
-        text_parts = []
-        for i, page in enumerate(reader.pages[:10]):
-            text_parts.append(page.extract_text() or "")
-        preview = "\n".join(text_parts)
+        # текст страниц разбирается один раз на хеш файла и кладётся в doc_page_text
+        file_hash = file_md5(path)
+        preview = join_pages(ensure_pages(file_hash, path), 10)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"PDF read error: {e}")
 
+    # файл из /data остаётся на месте, документ ссылается на копию в хранилище
     with get_conn() as conn, conn.cursor() as cur:
+        stored = blob_store.claim(cur, file_hash, os.path.getsize(path))
+        try:
+            blob_store.place_file(path, file_hash, keep_source=True)
+        except OSError as e:
+            raise HTTPException(status_code=500, detail=f"Failed to store file: {e}")
         cur.execute(
-            "INSERT INTO documents (source, title, path) VALUES (%s, %s, %s) RETURNING doc_id",
-            (payload.source, payload.title, path),
+            "INSERT INTO documents (source, title, path, file_hash) VALUES (%s, %s, %s, %s) RETURNING doc_id",
+            (payload.source, payload.title, stored, file_hash),
         )
         doc_id = cur.fetchone()['doc_id']
         conn.commit()
 
-    return {"doc_id": doc_id, "path": path, "chars_preview": len(preview), "preview": preview[:800]}
+    return {"doc_id": doc_id, "path": stored, "chars_preview": len(preview), "preview": preview[:800]}
+
+def _document_pages(doc_id: int, pages_limit: int | None) -> List[str]:
+    """Первые pages_limit страниц документа (None = все) или HTTP-ошибка."""
+    try:
+        pages = document_pages(doc_id)
+    except PdfEncryptedError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except PdfTimeoutError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except PdfTextError as e:
+        raise HTTPException(status_code=500, detail=f"PDF read error: {str(e)[:100]}")
+    if pages is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return pages[: (pages_limit or len(pages))]
+
+def _document_text(doc_id: int, pages_limit: int | None) -> str:
+    """Текст первых pages_limit страниц документа (None = все) или HTTP-ошибка."""
+    return join_pages(_document_pages(doc_id, pages_limit))
+
+_UPSERT_DOC_COURSES_SQL = """
+    WITH ins AS (
+      INSERT INTO doc_course_map (doc_id, course_id, confidence, rule_text)
+      SELECT %s, t.course_id, t.confidence, t.rule_text
+      FROM unnest(%s::text[], %s::numeric[], %s::text[]) AS t(course_id, confidence, rule_text)
+      ON CONFLICT (doc_id, course_id) DO NOTHING
+      RETURNING 1
+    )
+    SELECT COUNT(*) AS inserted FROM ins
+"""
+
+def _upsert_doc_courses(cur, doc_id: int, rows: List[Tuple[str, float, str]]) -> Tuple[int, int]:
+    """
+    Пишет (course_id, confidence, rule_text) в doc_course_map одним запросом,
+    уже сопоставленные курсы пропускает. Возвращает (inserted, skipped).
+    """
+    if not rows:
+        return 0, 0
+    course_ids, confidences, texts = (list(col) for col in zip(*rows))
+    cur.execute(_UPSERT_DOC_COURSES_SQL, (doc_id, course_ids, confidences, texts))
+    inserted = cur.fetchone()["inserted"]
+    return inserted, len(rows) - inserted
+
+_PROMOTE_RULES_SQL = """
+    WITH pairs AS (
+      SELECT r.role_id, c.course_id
+      FROM unnest(%(role_ids)s::int[]) AS r(role_id)
+      CROSS JOIN unnest(%(course_ids)s::text[]) AS c(course_id)
+    ), ins AS (
+      INSERT INTO rule_requirements (role_id, course_id, frequency, region, active)
+      SELECT role_id, course_id, %(frequency)s, %(region)s, TRUE FROM pairs
+      ON CONFLICT (role_id, course_id, region) DO NOTHING
+      RETURNING role_id, course_id
+    )
+    SELECT p.role_id, p.course_id, (i.role_id IS NOT NULL) AS inserted
+    FROM pairs p
+    LEFT JOIN ins i ON i.role_id = p.role_id AND i.course_id = p.course_id
+    ORDER BY p.role_id, p.course_id
+"""
+
+def _promote_rules(cur, role_ids: List[int], course_ids: List[str], frequency: str, region: str) -> List[dict]:
+    """
+    Добавляет rule_requirements для всех пар роль × курс одним запросом
+    (существующие правила не трогает). Возвращает [{role_id, course_id, inserted}].
+    """
+    role_ids, course_ids = list(dict.fromkeys(role_ids)), list(dict.fromkeys(course_ids))
+    if not role_ids or not course_ids:
+        return []
+    cur.execute(
+        _PROMOTE_RULES_SQL,
+        {"role_ids": role_ids, "course_ids": course_ids, "frequency": frequency, "region": region},
+    )
+    return cur.fetchall()
+
+_SEARCH_SQL = """
+    WITH q AS (SELECT websearch_to_tsquery('english', %(q)s) AS query),
+    hits AS (
+      SELECT p.file_hash, p.page_number, p.text, ts_rank_cd(p.tsv, q.query) AS rank
+      FROM doc_page_text p, q
+      WHERE p.tsv @@ q.query
+        AND EXISTS (SELECT 1 FROM documents d WHERE d.file_hash = p.file_hash)
+      ORDER BY rank DESC, p.file_hash, p.page_number
+      LIMIT %(limit)s OFFSET %(offset)s
+    )
+    -- ts_headline дорогой, поэтому только для отобранной страницы результатов
+    SELECT d.doc_id, d.title, h.page_number, h.rank,
+           ts_headline('english', h.text, q.query,
+                       'MaxFragments=2, MinWords=8, MaxWords=30, FragmentDelimiter=" ... "') AS snippet
+    FROM hits h
+    CROSS JOIN q
+    JOIN LATERAL (
+      SELECT doc_id, title FROM documents
+      WHERE file_hash = h.file_hash
+      ORDER BY doc_id LIMIT 1
+    ) d ON TRUE
+    ORDER BY h.rank DESC, d.doc_id, h.page_number
+"""
+
+@router.get("/documents/search")
+async def search_documents(
+    q: str = Query(..., min_length=1, description="Запрос: слова, \"фраза\", OR, -исключить"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+):
+    # поиск по doc_page_text.tsv (GIN), PDF не перечитываются
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Empty query")
+    async with get_async_conn() as conn, conn.cursor() as cur:
+        await cur.execute(_SEARCH_SQL, {"q": q, "limit": limit, "offset": offset})
+        rows = await cur.fetchall()
+    return {
+        "query": q,
+        "count": len(rows),
+        "items": [
+            {
+                "doc_id": r["doc_id"],
+                "title": r["title"],
+                "page": r["page_number"],
+                "rank": round(float(r["rank"]), 4),
+                "snippet": r["snippet"],
+            }
+            for r in rows
+        ],
+    }
 
 class MapDoc(BaseModel):
     doc_id: int
     pages_limit: int | None = 20  # сколько страниц читать из PDF
+    region: str = "US-CA"         # общие правила mapping_rules + правила региона
 
 @router.post("/documents/map")
 def map_document(payload: MapDoc):
-    # 1) найдём путь к PDF
-    with get_conn() as conn, conn.cursor() as cur:
-        cur.execute("SELECT path FROM documents WHERE doc_id=%s", (payload.doc_id,))
-        row = cur.fetchone()
-        if not row:
-            raise HTTPException(status_code=404, detail="Document not found")
-        path = row['path']
-
-    # 2) вытащим текст
-    try:
-        reader = PdfReader(path)
-        pages = reader.pages[: (payload.pages_limit or len(reader.pages))]
-        text = "\n".join((p.extract_text() or "") for p in pages)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"PDF read error: {e}")
+    # 1-2) текст документа (из doc_page_text, PDF разбирается только при новом хеше)
+    text = _document_text(payload.doc_id, payload.pages_limit)
 
     # 3) применим правила → список (course_id, confidence, excerpt)
-    matches = map_text_to_courses(text)
+    matches = map_text_to_courses(text, payload.region)
 
     # 4) сохраним в doc_course_map (перезатираем старые записи для этого doc_id)
     with get_conn() as conn, conn.cursor() as cur:
         cur.execute("DELETE FROM doc_course_map WHERE doc_id=%s", (payload.doc_id,))
-        for course_id, conf, excerpt in matches:
-            cur.execute(
-                "INSERT INTO doc_course_map (doc_id, course_id, confidence, rule_text) VALUES (%s,%s,%s,%s)",
-                (payload.doc_id, course_id, float(conf), excerpt[:1000]),
-            )
+        inserted, _ = _upsert_doc_courses(
+            cur, payload.doc_id, [(course_id, float(conf), excerpt[:1000]) for course_id, conf, excerpt in matches]
+        )
         conn.commit()
 
     return {
         "doc_id": payload.doc_id,
-        "inserted": len(matches),
+        "inserted": inserted,
         "suggestions": [
             {"course_id": cid, "confidence": round(conf, 2), "excerpt": ex[:240]}
             for cid, conf, ex in matches
@@ -108,74 +231,44 @@ def promote_document_courses(payload: PromoteReq):
         if not courses:
             return {"inserted": 0, "skipped": 0, "role": payload.role, "courses": []}
 
-        inserted = 0
-        skipped = 0
-        kept = []
-
-        # 3) вставляем в rule_requirements (idempotent)
-        for cid in courses:
-            cur.execute("""
-                INSERT INTO rule_requirements (role_id, course_id, frequency, region, active)
-                VALUES (%s,%s,%s,%s,TRUE)
-                ON CONFLICT (role_id, course_id, region) DO NOTHING
-            """, (role_id, cid, payload.frequency, payload.region))
-            if cur.rowcount == 1:
-                inserted += 1
-            else:
-                skipped += 1
-            kept.append(cid)
+        # 3) вставляем в rule_requirements одним запросом (idempotent)
+        promoted = _promote_rules(cur, [role_id], courses, payload.frequency, payload.region)
+        inserted = sum(1 for row in promoted if row['inserted'])
+        skipped = len(promoted) - inserted
+        kept = [row['course_id'] for row in promoted]
 
         conn.commit()
+    if inserted:
+        requirements_cache.invalidate()
 
     return {"inserted": inserted, "skipped": skipped, "role": payload.role, "courses": kept}
 
 class ExtractDoc(BaseModel):
     doc_id: int
     pages_limit: int | None = 20  # None = читать весь документ
+    use_llm_cache: bool = True    # False = заново спросить модель, минуя llm_cache
 
 @router.post("/documents/extract")
 def extract_document_courses(payload: ExtractDoc):
-    # 1) путь к PDF
-    with get_conn() as conn, conn.cursor() as cur:
-        cur.execute("SELECT path FROM documents WHERE doc_id=%s", (payload.doc_id,))
-        row = cur.fetchone()
-        if not row:
-            raise HTTPException(status_code=404, detail="Document not found")
-        path = row['path']
-
-    # 2) читаем текст
-    try:
-        reader = PdfReader(path)
-        pages = reader.pages[: (payload.pages_limit or len(reader.pages))]
-        text = "\n".join((p.extract_text() or "") for p in pages)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"PDF read error: {e}")
+    # 1-2) страницы документа (длинный документ модель читает кусками)
+    pages = _document_pages(payload.doc_id, payload.pages_limit)
 
     # 3) каталог курсов для модели
     with get_conn() as conn, conn.cursor() as cur:
-        cur.execute("SELECT course_id, title FROM courses")
-        catalog = [{"course_id": r['course_id'], "title": r['title']} for r in cur.fetchall()]
+        cur.execute("SELECT course_id, title, description, tags FROM courses")
+        catalog = cur.fetchall()  # description/tags нужны BM25-префильтру перед LLM
     known_ids = {c["course_id"] for c in catalog}
 
     # 4) зовём LLM
-    matches = extract_courses(text, catalog)  # [{course_id, confidence, evidence}]
+    matches = extract_courses(pages, catalog, use_cache=payload.use_llm_cache)  # [{course_id, confidence, evidence}]
 
-    # 5) сохраняем (без дублей на (doc_id, course_id))
-    inserted, skipped = 0, 0
+    # 5) сохраняем одним запросом (без дублей на (doc_id, course_id))
+    rows = [
+        (m["course_id"], float(m.get("confidence", 0.5)), m.get("evidence","")[:1000])
+        for m in matches if m["course_id"] in known_ids
+    ]
     with get_conn() as conn, conn.cursor() as cur:
-        for m in matches:
-            cid = m["course_id"]
-            if cid not in known_ids:
-                continue
-            cur.execute("SELECT 1 FROM doc_course_map WHERE doc_id=%s AND course_id=%s", (payload.doc_id, cid))
-            if cur.fetchone():
-                skipped += 1
-                continue
-            cur.execute(
-                "INSERT INTO doc_course_map (doc_id, course_id, confidence, rule_text) VALUES (%s,%s,%s,%s)",
-                (payload.doc_id, cid, float(m.get("confidence", 0.5)), m.get("evidence","")[:1000]),
-            )
-            inserted += 1
+        inserted, skipped = _upsert_doc_courses(cur, payload.doc_id, rows)
         conn.commit()
 
     return {
@@ -193,55 +286,42 @@ class ProcessDoc(BaseModel):
     region: str = "US-CA"
     frequency: str = "annual"
     pages_limit: int | None = 20  # None = read all pages
+    use_llm_cache: bool = True    # False = bypass llm_cache and call the model again
 
 @router.post("/documents/process")
 def process_document(payload: ProcessDoc):
-    # 1) resolve path and get role if not provided
-    with get_conn() as conn, conn.cursor() as cur:
-        cur.execute("SELECT path FROM documents WHERE doc_id=%s", (payload.doc_id,))
-        row = cur.fetchone()
-        if not row:
-            raise HTTPException(status_code=404, detail="Document not found")
-        path = row['path']
-        
-        # Get all roles from database for AI analysis
-        cur.execute("SELECT role_id, name FROM roles")
-        all_roles = cur.fetchall()
-        if not all_roles:
-            raise HTTPException(status_code=500, detail="No roles found in database")
-
-    # 2) read and validate PDF
-    try:
-        reader = PdfReader(path)
-        if reader.is_encrypted:
-            raise HTTPException(status_code=400, detail="Encrypted PDFs not supported")
-        
-        pages = reader.pages[: (payload.pages_limit or len(reader.pages))]
-        text = "\n".join((p.extract_text() or "") for p in pages)
-        
-        # Validate text content
-        if len(text.strip()) < 50:
-            raise HTTPException(status_code=400, detail="PDF contains insufficient text for analysis")
-        
-        # Limit text size for AI processing
-        if len(text) > 50000:
-            text = text[:50000] + "\n[Text truncated]"
-            
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"PDF read error: {str(e)[:100]}")
+    # 1) read cached page text (PDF is parsed only once per file hash)
+    pages = _document_pages(payload.doc_id, payload.pages_limit)
+    text = join_pages(pages)
+
+    # Get all roles for AI analysis (in-process cache, reset on NOTIFY when roles change)
+    role_ids_by_name = requirements_cache.roles()
+    if not role_ids_by_name:
+        raise HTTPException(status_code=500, detail="No roles found in database")
+
+    # 2) validate text content
+    if len(text.strip()) < 50:
+        raise HTTPException(status_code=400, detail="PDF contains insufficient text for analysis")
 
     # 3) catalog
     with get_conn() as conn, conn.cursor() as cur:
-        cur.execute("SELECT course_id, title FROM courses")
-        catalog = [{"course_id": r['course_id'], "title": r['title']} for r in cur.fetchall()]
+        cur.execute("SELECT course_id, title, description, tags FROM courses")
+        catalog = cur.fetchall()  # description/tags нужны BM25-префильтру перед LLM
     known_ids = {c["course_id"] for c in catalog}
 
-    # 4) AI extract with error handling
+    # 4) AI extract with error handling: courses and roles are independent
+    #    Bedrock calls, so run them concurrently (in-flight limit is in bedrock_client)
+    roles_for_ai = [{'name': name} for name in role_ids_by_name]
+    logger.info(f"Starting course and role extraction for doc_id {payload.doc_id} with roles: {[r['name'] for r in roles_for_ai]}")
+    logger.info(f"Text sample for AI: {text[:200]}...")
+    #    Long documents are split into chunks inside the extractors (map-reduce),
+    #    so the whole document is analysed instead of the first 50k chars
+    courses_future = _ai_executor.submit(extract_courses, pages, catalog, payload.use_llm_cache)
+    roles_future = _ai_executor.submit(extract_roles, pages, roles_for_ai, payload.use_llm_cache)
+
     matches = []
     try:
-        matches = extract_courses(text, catalog)
+        matches = courses_future.result()
         logger.info(f"Course extraction: {len(matches)} courses found")
     except Exception as e:
         logger.error(f"Course extraction failed: {str(e)[:200]}")
@@ -249,95 +329,45 @@ def process_document(payload: ProcessDoc):
             matches = []  # Continue without AI analysis
         else:
             matches = []  # Graceful degradation
-    
+
     try:
-        roles_for_ai = [{'name': r['name']} for r in all_roles]
-        logger.info(f"Starting role extraction for doc_id {payload.doc_id} with roles: {[r['name'] for r in roles_for_ai]}")
-        logger.info(f"Text sample for AI: {text[:200]}...")
-        role_matches = extract_roles(text, roles_for_ai)  # [{role_name, confidence, reasoning}]
+        role_matches = roles_future.result()  # [{role_name, confidence, reasoning}]
         logger.info(f"Role extraction completed: found {len(role_matches)} role matches: {role_matches}")
     except Exception as e:
         logger.error(f"Role extraction failed: {str(e)[:200]}")
         role_matches = []  # No fallback - use only AI results
 
-    # 5) upsert into doc_course_map
-    mapped_inserted, mapped_skipped = 0, 0
-    kept_ids = set()
+    # 5) upsert into doc_course_map (one statement for all suggested courses)
+    rows = [
+        (m["course_id"], float(m.get("confidence", 0.5)), m.get("evidence","")[:1000])
+        for m in matches if m.get("course_id") in known_ids
+    ]
+    kept_ids = {cid for cid, _, _ in rows}
     with get_conn() as conn, conn.cursor() as cur:
-        for m in matches:
-            cid = m.get("course_id")
-            if cid not in known_ids:
-                continue
-            kept_ids.add(cid)
-            cur.execute("SELECT 1 FROM doc_course_map WHERE doc_id=%s AND course_id=%s", (payload.doc_id, cid))
-            if cur.fetchone():
-                mapped_skipped += 1
-                continue
-            cur.execute(
-                "INSERT INTO doc_course_map (doc_id, course_id, confidence, rule_text) VALUES (%s,%s,%s,%s)",
-                (payload.doc_id, cid, float(m.get("confidence", 0.5)), m.get("evidence","")[:1000]),
-            )
-            mapped_inserted += 1
+        mapped_inserted, mapped_skipped = _upsert_doc_courses(cur, payload.doc_id, rows)
         conn.commit()
 
-    # 6) promote to rule_requirements for AI-detected roles
-    rules_inserted, rules_skipped = 0, 0
-    applied_roles = []
+    # 6) promote to rule_requirements for AI-detected roles (confidence >= 0.6),
+    #    all role x course pairs in one statement
+    applied_roles = list(dict.fromkeys(
+        m['role_name'] for m in role_matches
+        if m['confidence'] >= 0.6 and m['role_name'] in role_ids_by_name
+    ))
     with get_conn() as conn, conn.cursor() as cur:
-        # Apply to roles with confidence >= 0.6
-        for role_match in role_matches:
-            if role_match['confidence'] < 0.6:
-                continue
-            role_name = role_match['role_name']
-            cur.execute("SELECT role_id FROM roles WHERE name=%s", (role_name,))
-            role_row = cur.fetchone()
-            if not role_row:
-                continue
-            role_id = role_row['role_id']
-            applied_roles.append(role_name)
-            
-            for cid in kept_ids:
-                cur.execute("""
-                    INSERT INTO rule_requirements (role_id, course_id, frequency, region, active)
-                    VALUES (%s,%s,%s,%s,TRUE)
-                    ON CONFLICT (role_id, course_id, region) DO NOTHING
-                """, (role_id, cid, payload.frequency, payload.region))
-                if cur.rowcount == 1:
-                    rules_inserted += 1
-                else:
-                    rules_skipped += 1
+        promoted = _promote_rules(
+            cur, [role_ids_by_name[name] for name in applied_roles], sorted(kept_ids),
+            payload.frequency, payload.region,
+        )
         conn.commit()
+    rules_inserted = sum(1 for row in promoted if row['inserted'])
+    rules_skipped = len(promoted) - rules_inserted
+    if rules_inserted:
+        # NOTIFY дойдёт до слушателя асинхронно, а раскладке ниже нужны новые правила уже сейчас
+        requirements_cache.invalidate()
 
-    # 7) sync assignments for users with detected roles
-    assignments_inserted = 0
-    with get_conn() as conn, conn.cursor() as cur:
-        for role_name in applied_roles:
-            cur.execute("""
-            INSERT INTO assignments (user_id, course_id, status, due_date, assigned_by)
-            ON CONFLICT (user_id, course_id) DO NOTHING
-            SELECT u.user_id,
-                   rr.course_id,
-                   'assigned'::text,
-                   COALESCE(
-                     CASE rr.frequency
-                       WHEN 'annual' THEN CURRENT_DATE + INTERVAL '365 days'
-                       WHEN 'every_3_years' THEN CURRENT_DATE + INTERVAL '1095 days'
-                       ELSE CURRENT_DATE + INTERVAL '365 days'
-                     END,
-                     CURRENT_DATE + INTERVAL '365 days'
-                   ),
-                   'system'::text
-            FROM users u
-            JOIN roles r ON r.name = u.role
-            JOIN rule_requirements rr
-              ON rr.role_id = r.role_id
-             AND COALESCE(rr.active, TRUE)
-             AND (rr.region IS NULL OR rr.region = %(region)s)
-            WHERE r.name = %(role_name)s
-;
-            """, {"role_name": role_name, "region": payload.region})
-            assignments_inserted += cur.rowcount
-        conn.commit()
+    # 7) sync assignments for users with detected roles (chunked, one statement per chunk)
+    fanout = propagate_assignments([role_ids_by_name[name] for name in applied_roles], payload.region)
+    assignments_inserted = fanout["inserted"]
 
     return {
         "doc_id": payload.doc_id,
@@ -356,3 +386,9 @@ def process_document(payload: ProcessDoc):
         "summary": f"Found {len(matches)} courses, applied to {len(applied_roles)} roles, created {assignments_inserted} new assignments",
         "processing_status": "success" if matches and role_matches else "partial" if matches or role_matches else "ai_unavailable"
     }
+
+def _process_document_job(payload: dict) -> dict:
+    return process_document(ProcessDoc(**payload))
+
+# /jobs/documents/process выполняет ту же обработку в фоновом воркере
+register_handler("process_document", _process_document_job)
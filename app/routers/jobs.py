@@ -0,0 +1,31 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from app.jobs import enqueue, get_job
+from app.routers.documents import ProcessDoc
+
+router = APIRouter()
+
+@router.post("/jobs/documents/process", status_code=202)
+async def submit_process_document(payload: ProcessDoc):
+    """Ставит обработку документа в очередь; результат — через /jobs/{job_id}/result"""
+    job_id = await run_in_threadpool(enqueue, "process_document", payload.model_dump())
+    return {"job_id": job_id, "status": "queued"}
+
+@router.get("/jobs/{job_id}")
+async def job_status(job_id: int):
+    job = await run_in_threadpool(get_job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    job.pop("result", None)
+    return job
+
+@router.get("/jobs/{job_id}/result")
+async def job_result(job_id: int):
+    job = await run_in_threadpool(get_job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] == "failed":
+        raise HTTPException(status_code=409, detail=f"Job failed: {job['error']}")
+    if job["status"] != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    return {"job_id": job_id, "status": job["status"], "result": job["result"]}
@@ -1,51 +1,107 @@
+import json
+from typing import List
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from app.db import get_conn
+from app.db import get_async_conn
 
 router = APIRouter()
 
 class RecommendByUser(BaseModel):
     user_id: str
 
+class RecommendBatch(BaseModel):
+    # фильтры складываются по AND; нужен хотя бы один
+    user_ids: List[str] | None = None
+    department: str | None = None
+    role: str | None = None
+    region: str = "US-CA"
+
+_BATCH_ITERSIZE = 2000  # строк за один FETCH из серверного курсора
+
+_BATCH_SQL = """
+SELECT u.user_id, r.course_id, r.title, r.category
+FROM users u
+LEFT JOIN LATERAL (
+  SELECT c.course_id, c.title, c.category
+  FROM courses c
+  WHERE c.course_id IN (
+    SELECT g.course_id
+    FROM user_required_course g
+    WHERE g.user_id = u.user_id AND g.region IN ('', %(region)s)
+  )
+) r ON TRUE
+WHERE (%(user_ids)s::text[] IS NULL OR u.user_id = ANY(%(user_ids)s::text[]))
+  AND (%(department)s::text IS NULL OR u.department = %(department)s::text)
+  AND (%(role)s::text IS NULL OR u.role = %(role)s::text)
+ORDER BY u.user_id, r.title
+"""
+
 @router.get("/recommend")
-def recommend(user_id: str = Query(...)):
+async def recommend(user_id: str = Query(...), region: str = Query("US-CA")):
     uid = user_id
 
     q_user = "SELECT 1 FROM users WHERE user_id=%s"
 
+    # Пробелы заранее посчитаны в user_required_course (поддерживается триггерами,
+    # см. миграцию 0015): поиск по первичному ключу (user_id, region, course_id).
+    # region '' — требования без региона.
     q = """
-    WITH u AS (
-      SELECT r.role_id
-      FROM users u
-      JOIN roles r ON r.name = u.role
-      WHERE u.user_id = %(uid)s
-    ),
-    needed AS (
-      SELECT rr.course_id
-      FROM rule_requirements rr
-      JOIN u ON rr.role_id = u.role_id
-      WHERE COALESCE(rr.active, TRUE)
-        AND (rr.region IS NULL OR rr.region = 'US-CA')
-    ),
-    filtered AS (
-      SELECT n.course_id
-      FROM needed n
-      LEFT JOIN user_courses uc
-        ON uc.user_id = %(uid)s AND uc.course_id = n.course_id
-      WHERE uc.course_id IS NULL
-    )
     SELECT c.course_id, c.title, c.category
     FROM courses c
-    JOIN filtered f ON f.course_id = c.course_id
+    WHERE c.course_id IN (
+      SELECT g.course_id
+      FROM user_required_course g
+      WHERE g.user_id = %(uid)s AND g.region IN ('', %(region)s)
+    )
     ORDER BY c.title;
     """
 
-    with get_conn() as conn, conn.cursor() as cur:
-        cur.execute(q_user, (uid,))
-        if cur.fetchone() is None:
+    async with get_async_conn() as conn, conn.cursor() as cur:
+        await cur.execute(q_user, (uid,))
+        if await cur.fetchone() is None:
             raise HTTPException(status_code=404, detail="User not found")
-        cur.execute(q, {"uid": uid})
-        rows = cur.fetchall()
+        await cur.execute(q, {"uid": uid, "region": region})
+        rows = await cur.fetchall()
         items = [{"course_id": r["course_id"], "title": r["title"], "category": r["category"]} for r in rows]
 
-    return {"user_id": uid, "count": len(items), "items": items}
+    return {"user_id": uid, "region": region, "count": len(items), "items": items}
+
+@router.post("/recommend/batch")
+async def recommend_batch(payload: RecommendBatch):
+    """
+    Рекомендации для списка пользователей / отдела / роли одним запросом.
+    Ответ — NDJSON, строка на пользователя в формате /recommend;
+    для user_ids, которых нет в users, — {"user_id": ..., "error": "User not found"}.
+    Строки читаются из серверного курсора пачками, так что память не растёт
+    с размером организации.
+    """
+    if payload.user_ids is None and payload.department is None and payload.role is None:
+        raise HTTPException(status_code=400, detail="Provide user_ids, department or role")
+    params = payload.model_dump()
+
+    def line(obj: dict) -> str:
+        return json.dumps(obj, ensure_ascii=False) + "\n"
+
+    async def rows():
+        seen = set()  # только для отчёта о ненайденных user_ids
+        current, items = None, []
+        async with get_async_conn() as conn, conn.cursor(name="recommend_batch") as cur:
+            cur.itersize = _BATCH_ITERSIZE
+            await cur.execute(_BATCH_SQL, params)
+            async for r in cur:
+                if r["user_id"] != current:
+                    if current is not None:
+                        yield line({"user_id": current, "region": payload.region, "count": len(items), "items": items})
+                    current, items = r["user_id"], []
+                    if payload.user_ids is not None:
+                        seen.add(current)
+                if r["course_id"] is not None:
+                    items.append({"course_id": r["course_id"], "title": r["title"], "category": r["category"]})
+        if current is not None:
+            yield line({"user_id": current, "region": payload.region, "count": len(items), "items": items})
+        for uid in dict.fromkeys(payload.user_ids or []):
+            if uid not in seen:
+                yield line({"user_id": uid, "error": "User not found"})
+
+    return StreamingResponse(rows(), media_type="application/x-ndjson")
@@ -2,7 +2,7 @@ from datetime import date, datetime
 from typing import List, Optional
 from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
-from app.db import get_conn
+from app.db import get_async_conn
 
 router = APIRouter()
 
@@ -24,7 +24,7 @@ class TrainingHistoryResponse(BaseModel):
     items: List[TrainingHistoryItem]
 
 @router.get("/reports/training-history", response_model=TrainingHistoryResponse)
-def get_training_history(user_id: str = Query(...)):
+async def get_training_history(user_id: str = Query(...)):
     if not user_id:
         raise HTTPException(status_code=400, detail="user_id is required")
     
@@ -54,9 +54,9 @@ def get_training_history(user_id: str = Query(...)):
     """
     
     try:
-        with get_conn() as conn, conn.cursor() as cur:
-            cur.execute(sql, (user_id,))
-            rows = cur.fetchall()
+        async with get_async_conn() as conn, conn.cursor() as cur:
+            await cur.execute(sql, (user_id,))
+            rows = await cur.fetchall()
             
             items = []
             completed = 0
@@ -1,23 +1,23 @@
 import logging
 from fastapi import APIRouter, HTTPException
-from app.db import get_conn
+from app.db import get_async_conn
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 @router.get("/stats")
-def get_stats():
+async def get_stats():
     """
     Возвращает статистику системы из БД
     """
     try:
-        with get_conn() as conn, conn.cursor() as cur:
+        async with get_async_conn() as conn, conn.cursor() as cur:
             stats = {}
             
             # Пользователи
             try:
-                cur.execute("SELECT COUNT(*) FROM users")
-                result = cur.fetchone()
+                await cur.execute("SELECT COUNT(*) FROM users")
+                result = await cur.fetchone()
                 stats["users"] = result['count'] if result and 'count' in result else (result[0] if result else 0)
             except Exception as e:
                 logger.warning(f"Users count failed: {e}")
@@ -25,8 +25,8 @@ def get_stats():
             
             # Курсы
             try:
-                cur.execute("SELECT COUNT(*) FROM courses")
-                result = cur.fetchone()
+                await cur.execute("SELECT COUNT(*) FROM courses")
+                result = await cur.fetchone()
                 stats["courses"] = result['count'] if result and 'count' in result else (result[0] if result else 0)
             except Exception as e:
                 logger.warning(f"Courses count failed: {e}")
@@ -34,8 +34,8 @@ def get_stats():
             
             # Назначения
             try:
-                cur.execute("SELECT COUNT(*) FROM assignments")
-                result = cur.fetchone()
+                await cur.execute("SELECT COUNT(*) FROM assignments")
+                result = await cur.fetchone()
                 stats["assignments"] = result['count'] if result and 'count' in result else (result[0] if result else 0)
             except Exception as e:
                 logger.warning(f"Assignments count failed: {e}")
@@ -43,8 +43,8 @@ def get_stats():
             
             # Документы
             try:
-                cur.execute("SELECT COUNT(*) FROM documents")
-                result = cur.fetchone()
+                await cur.execute("SELECT COUNT(*) FROM documents")
+                result = await cur.fetchone()
                 logger.info(f"Documents result type: {type(result)}, value: {result}")
                 if isinstance(result, dict):
                     stats["documents"] = result.get('count', 0)
@@ -63,24 +63,24 @@ def get_stats():
         raise HTTPException(status_code=500, detail=f"stats error: {e}")
 
 @router.get("/stats/users")
-def get_users():
+async def get_users():
     """Получить список всех пользователей"""
     try:
-        with get_conn() as conn, conn.cursor() as cur:
-            cur.execute("SELECT user_id, name, email, role, department FROM users ORDER BY user_id")
-            rows = cur.fetchall()
+        async with get_async_conn() as conn, conn.cursor() as cur:
+            await cur.execute("SELECT user_id, name, email, role, department FROM users ORDER BY user_id")
+            rows = await cur.fetchall()
             return rows
     except Exception as e:
         logger.error(f"Users fetch error: {e}")
         raise HTTPException(status_code=500, detail=f"users fetch error: {e}")
 
 @router.get("/stats/courses")
-def get_courses():
+async def get_courses():
     """Получить список всех курсов"""
     try:
-        with get_conn() as conn, conn.cursor() as cur:
-            cur.execute("SELECT course_id, title, category FROM courses ORDER BY course_id")
-            rows = cur.fetchall()
+        async with get_async_conn() as conn, conn.cursor() as cur:
+            await cur.execute("SELECT course_id, title, category FROM courses ORDER BY course_id")
+            rows = await cur.fetchall()
             return rows
     except Exception as e:
         logger.error(f"Courses fetch error: {e}")
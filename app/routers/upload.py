@@ -1,13 +1,30 @@
 import os
 import hashlib
 import logging
+import tempfile
 from fastapi import APIRouter, UploadFile, File, HTTPException
-from app.db import get_conn
+from fastapi.concurrency import run_in_threadpool
+from app.db import get_async_conn
+from app.pdf_text import ensure_pages
+from app import blob_store
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+CHUNK_SIZE = 1024 * 1024  # читаем загрузку кусками по 1 МБ — память не зависит от размера файла
+
+def _finish_temp(tmp) -> None:
+    tmp.flush()
+    os.fsync(tmp.fileno())
+    tmp.close()
+
+def _discard(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
 @router.post("/upload/pdf")
 async def upload_document(
     file: UploadFile = File(...),
@@ -18,49 +35,61 @@ async def upload_document(
     if not fname.lower().endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Only PDF files are supported")
 
-    # Создаем папку если её нет
-    data_dir = "./data"
-    os.makedirs(data_dir, exist_ok=True)
-    
-    dest = os.path.join(data_dir, fname)
-
-    # вычисляем хеш файла
+    # пишем поток во временный файл в хранилище и считаем хеш по ходу
     file_hash = hashlib.md5()
-    file_content = await file.read()
-    file_hash.update(file_content)
-    hash_value = file_hash.hexdigest()
-    
-    # проверяем дубли по хешу
-    with get_conn() as conn, conn.cursor() as cur:
-        cur.execute("SELECT doc_id, title FROM documents WHERE file_hash = %s", (hash_value,))
-        existing = cur.fetchone()
-        if existing:
-            return {
-                "duplicate": True,
-                "doc_id": existing['doc_id'],
-                "message": f"File already exists as '{existing['title']}'",
-                "filename": fname
-            }
-    
-    # сохраняем файл
+    size = 0
+    try:
+        tmp = tempfile.NamedTemporaryFile(dir=blob_store.temp_dir(), prefix=".upload-", suffix=".part", delete=False)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to save file: {e}")
     try:
-        with open(dest, "wb") as out:
-            out.write(file_content)
+        while chunk := await file.read(CHUNK_SIZE):
+            file_hash.update(chunk)
+            size += len(chunk)
+            await run_in_threadpool(tmp.write, chunk)
+        await run_in_threadpool(_finish_temp, tmp)
     except Exception as e:
+        tmp.close()
+        _discard(tmp.name)
         raise HTTPException(status_code=500, detail=f"Failed to save file: {e}")
+    hash_value = file_hash.hexdigest()
+
+    # проверяем дубли по хешу (когда поток уже прочитан целиком)
+    async with get_async_conn() as conn, conn.cursor() as cur:
+        await cur.execute("SELECT doc_id, title FROM documents WHERE file_hash = %s", (hash_value,))
+        existing = await cur.fetchone()
+    if existing:
+        _discard(tmp.name)
+        return {
+            "duplicate": True,
+            "doc_id": existing['doc_id'],
+            "message": f"File already exists as '{existing['title']}'",
+            "filename": fname
+        }
 
-    size = os.path.getsize(dest)
     if not title:
         title = fname
 
-    # регистрируем документ в БД
-    with get_conn() as conn, conn.cursor() as cur:
-        cur.execute(
+    # кладём файл в контент-адресное хранилище и регистрируем документ одной транзакцией
+    async with get_async_conn() as conn, conn.cursor() as cur:
+        dest = await blob_store.aclaim(cur, hash_value, size)
+        try:
+            await run_in_threadpool(blob_store.place_file, tmp.name, hash_value)
+        except Exception as e:
+            _discard(tmp.name)
+            raise HTTPException(status_code=500, detail=f"Failed to save file: {e}")
+        await cur.execute(
             "INSERT INTO documents (source, title, path, file_hash) VALUES (%s,%s,%s,%s) RETURNING doc_id",
             (source, title, dest, hash_value),
         )
-        result = cur.fetchone()
+        result = await cur.fetchone()
         doc_id = result['doc_id']
-        conn.commit()
+        await conn.commit()
+
+    # сразу разбираем текст страниц в doc_page_text, чтобы map/extract/process его не парсили
+    try:
+        await run_in_threadpool(ensure_pages, hash_value, dest)
+    except Exception as e:
+        logger.warning(f"Page text extraction failed for doc_id {doc_id}: {e}")
 
     return {"doc_id": doc_id, "filename": fname, "bytes": size, "path": dest}
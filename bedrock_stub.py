@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for Bedrock runtime (invoke_model and
+invoke_model_with_response_stream wire formats) for offline
+load testing. Course/role prompts from app/ai get rule-generated JSON
+(matches by title/role words found in the text fragment), anything else
+gets a canned reply. Latency and throttling are configurable.
+
+    python3 bedrock_stub.py --port 8010 --latency lognormal:800,0.5 --rpm 60
+    BEDROCK_ENDPOINT_URL=http://127.0.0.1:8010 AWS_ACCESS_KEY_ID=x AWS_SECRET_ACCESS_KEY=x \\
+        uvicorn app.main:app
+
+Latency spec: fixed:MS | uniform:MIN_MS,MAX_MS | lognormal:MEDIAN_MS,SIGMA
+GET /stats — counters, POST /config — change settings at runtime.
+"""
+
+import os
+import re
+import json
+import zlib
+import base64
+import struct
+import time
+import random
+import asyncio
+import argparse
+from collections import deque
+from typing import Any, Dict, List
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+app = FastAPI(title="Bedrock stub")
+
+config: Dict[str, Any] = {
+    "latency": os.getenv("STUB_LATENCY", "lognormal:800,0.5"),
+    "ms_per_output_token": float(os.getenv("STUB_MS_PER_OUTPUT_TOKEN", "0")),
+    "throttle_rate": float(os.getenv("STUB_THROTTLE_RATE", "0")),        # доля случайных ThrottlingException
+    "rpm": float(os.getenv("STUB_RPM", "0")),                            # квота запросов в минуту (0 = без квоты)
+    "tpm": float(os.getenv("STUB_TPM", "0")),                            # квота токенов в минуту (0 = без квоты)
+    "max_concurrency": int(os.getenv("STUB_MAX_CONCURRENCY", "0")),      # больше одновременных — троттлинг
+}
+
+stats: Dict[str, Any] = {
+    "requests": 0, "ok": 0, "throttled": 0, "cancelled": 0, "inflight": 0, "peak_inflight": 0, "tokens": 0,
+}
+_window: deque = deque()  # (время, токены) за последнюю минуту — для квот rpm/tpm
+
+_CATALOG_RE = re.compile(r"Каталог курсов:\n(.*?)\n\n", re.S)
+_COURSE_TEXT_RE = re.compile(r"Фрагмент нормативного текста:\n(.*)\n\nJSON:", re.S)
+_ROLES_RE = re.compile(r"Role list:\n(.*?)\n\n", re.S)
+_ROLE_TEXT_RE = re.compile(r"Regulatory text fragment:\n(.*)\n\nJSON:", re.S)
+_WORD_RE = re.compile(r"[a-zа-я0-9]{4,}", re.I)
+
+def _latency_ms(spec: str | None = None) -> float:
+    spec = spec or config["latency"]
+    kind, _, args = spec.partition(":")
+    nums = [float(x) for x in args.split(",") if x]
+    if kind == "fixed":
+        return nums[0]
+    if kind == "uniform":
+        return random.uniform(nums[0], nums[1])
+    if kind == "lognormal":
+        return random.lognormvariate(0, nums[1] if len(nums) > 1 else 0.5) * nums[0]
+    raise ValueError(f"Unknown latency spec: {spec}")
+
+def _evidence(text: str, word: str) -> str:
+    i = text.lower().find(word.lower())
+    return " ".join(text[max(0, i - 80): i + 160].split())
+
+def _match(lines: List[str], text: str, key: str, evidence_key: str) -> List[Dict[str, Any]]:
+    """Строка 'id :: описание': совпала, если слова id/описания встречаются во фрагменте."""
+    lowered = text.lower()
+    out = []
+    for line in lines:
+        ident, _, desc = line.partition(" :: ")
+        ident = ident.strip()
+        words = {w.lower() for w in _WORD_RE.findall(ident.replace("_", " ") + " " + desc)}
+        found = [w for w in words if w in lowered]
+        if not ident or not found:
+            continue
+        out.append({
+            key: ident,
+            "confidence": round(min(0.95, 0.5 + 0.45 * len(found) / len(words)), 2),
+            evidence_key: _evidence(text, found[0]),
+        })
+    return out
+
+def _reply(prompt: str) -> str:
+    catalog, fragment = _CATALOG_RE.search(prompt), _COURSE_TEXT_RE.search(prompt)
+    if catalog and fragment:
+        return json.dumps({"matches": _match(catalog.group(1).splitlines(), fragment.group(1), "course_id", "evidence")})
+    roles, fragment = _ROLES_RE.search(prompt), _ROLE_TEXT_RE.search(prompt)
+    if roles and fragment:
+        return json.dumps({"roles": _match(roles.group(1).splitlines(), fragment.group(1), "role_name", "reasoning")})
+    return f"Stub reply ({len(prompt)} chars received). " + " ".join(_WORD_RE.findall(prompt)[:60])
+
+def _throttled(message: str) -> JSONResponse:
+    stats["throttled"] += 1
+    return JSONResponse(
+        status_code=429,
+        content={"message": message},
+        headers={"x-amzn-ErrorType": "ThrottlingException:http://internal.amazon.com/coral/com.amazon.bedrock/"},
+    )
+
+def _over_quota(tokens: int) -> str | None:
+    now = time.monotonic()
+    while _window and _window[0][0] < now - 60:
+        _window.popleft()
+    if config["rpm"] and len(_window) + 1 > config["rpm"]:
+        return "Too many requests, please wait before trying again."
+    if config["tpm"] and sum(t for _, t in _window) + tokens > config["tpm"]:
+        return "Too many tokens, please wait before trying again."
+    _window.append((now, tokens))
+    return None
+
+def _prompt(body: Dict[str, Any]) -> str:
+    return "\n".join(
+        part.get("text", "") if isinstance(part, dict) else str(part)
+        for msg in body.get("messages", [])
+        for part in (msg["content"] if isinstance(msg["content"], list) else [msg["content"]])
+    )
+
+def _admit(body: Dict[str, Any], input_tokens: int) -> JSONResponse | None:
+    """Троттлинг до начала ответа — как у Bedrock, 429 ThrottlingException."""
+    if config["max_concurrency"] and stats["inflight"] >= config["max_concurrency"]:
+        return _throttled("Too many concurrent requests.")
+    if random.random() < config["throttle_rate"]:
+        return _throttled("Too many requests, please wait before trying again.")
+    message = _over_quota(input_tokens + int(body.get("max_tokens", 0)))
+    if message:
+        return _throttled(message)
+    return None
+
+def _event_frame(payload: Dict[str, Any]) -> bytes:
+    """Сообщение application/vnd.amazon.eventstream c событием chunk."""
+    headers = b""
+    for name, value in ((":event-type", "chunk"), (":content-type", "application/json"), (":message-type", "event")):
+        headers += bytes([len(name)]) + name.encode() + b"\x07" + struct.pack(">H", len(value)) + value.encode()
+    body = json.dumps({"bytes": base64.b64encode(json.dumps(payload).encode()).decode()}).encode()
+    total = 12 + len(headers) + len(body) + 4
+    prelude = struct.pack(">II", total, len(headers))
+    prelude += struct.pack(">I", zlib.crc32(prelude))
+    message = prelude + headers + body
+    return message + struct.pack(">I", zlib.crc32(message))
+
+@app.post("/model/{model_id:path}/invoke-with-response-stream")
+async def invoke_stream(model_id: str, request: Request):
+    stats["requests"] += 1
+    body = json.loads(await request.body())
+    prompt = _prompt(body)
+    input_tokens = len(prompt) // 4
+    rejected = _admit(body, input_tokens)
+    if rejected:
+        return rejected
+
+    text = _reply(prompt)
+    pieces = re.findall(r"\S+\s*|\s+", text)
+
+    async def events():
+        # задержка latency — до первого токена, дальше ms_per_output_token на каждый кусок
+        stats["inflight"] += 1
+        stats["peak_inflight"] = max(stats["peak_inflight"], stats["inflight"])
+        try:
+            yield _event_frame({"type": "message_start", "message": {"model": model_id, "role": "assistant"}})
+            await asyncio.sleep(_latency_ms() / 1000)
+            for piece in pieces:
+                yield _event_frame({"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": piece}})
+                await asyncio.sleep(max(1, len(piece) // 4) * config["ms_per_output_token"] / 1000)
+            output_tokens = len(text) // 4
+            yield _event_frame({
+                "type": "message_stop",
+                "amazon-bedrock-invocationMetrics": {"inputTokenCount": input_tokens, "outputTokenCount": output_tokens},
+            })
+            stats["ok"] += 1
+            stats["tokens"] += input_tokens + output_tokens
+        except asyncio.CancelledError:
+            stats["cancelled"] += 1
+            raise
+        finally:
+            stats["inflight"] -= 1
+
+    return StreamingResponse(events(), media_type="application/vnd.amazon.eventstream")
+
+@app.post("/model/{model_id:path}/invoke")
+async def invoke(model_id: str, request: Request):
+    stats["requests"] += 1
+    body = json.loads(await request.body())
+    prompt = _prompt(body)
+    input_tokens = len(prompt) // 4
+    rejected = _admit(body, input_tokens)
+    if rejected:
+        return rejected
+
+    stats["inflight"] += 1
+    stats["peak_inflight"] = max(stats["peak_inflight"], stats["inflight"])
+    try:
+        text = _reply(prompt)
+        output_tokens = len(text) // 4
+        await asyncio.sleep((_latency_ms() + output_tokens * config["ms_per_output_token"]) / 1000)
+    finally:
+        stats["inflight"] -= 1
+    stats["ok"] += 1
+    stats["tokens"] += input_tokens + output_tokens
+    return {
+        "id": f"msg_stub_{stats['requests']}",
+        "type": "message",
+        "role": "assistant",
+        "model": model_id,
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn",
+        "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens},
+    }
+
+@app.get("/stats")
+def get_stats():
+    return {**stats, "config": config}
+
+@app.post("/config")
+def set_config(changes: Dict[str, Any]):
+    # сначала проверяем всё целиком, потом применяем — плохой запрос не меняет ничего
+    unknown = sorted(set(changes) - set(config))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown settings: {', '.join(unknown)}")
+    try:
+        updated = {k: type(config[k])(v) for k, v in changes.items()}
+        _latency_ms(updated.get("latency"))
+    except (TypeError, ValueError, IndexError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid config: {e}")
+    config.update(updated)
+    return config
+
+def main():
+    import uvicorn
+    parser = argparse.ArgumentParser(description="Local Bedrock runtime stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8010)
+    parser.add_argument("--latency", help="fixed:MS | uniform:MIN,MAX | lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--throttle-rate", type=float)
+    parser.add_argument("--rpm", type=float)
+    parser.add_argument("--tpm", type=float)
+    parser.add_argument("--max-concurrency", type=int)
+    args = parser.parse_args()
+    for key in ("latency", "throttle_rate", "rpm", "tpm", "max_concurrency"):
+        if getattr(args, key) is not None:
+            config[key] = getattr(args, key)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007_doc_page_text"
+down_revision = "0006_add_training_tracking"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Постраничный текст PDF, ключ — documents.file_hash (одинаковые файлы парсятся один раз)
+    op.create_table(
+        "doc_page_text",
+        sa.Column("file_hash", sa.String(64), nullable=False),
+        sa.Column("page_number", sa.Integer, nullable=False),
+        sa.Column("text", sa.Text, nullable=False, server_default=""),
+        sa.Column("extracted_at", sa.TIMESTAMP, server_default=sa.text("now()")),
+        sa.PrimaryKeyConstraint("file_hash", "page_number"),
+    )
+
+def downgrade():
+    op.drop_table("doc_page_text")
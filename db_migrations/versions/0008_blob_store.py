@@ -0,0 +1,56 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008_blob_store"
+down_revision = "0007_doc_page_text"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Контент-адресное хранилище: один файл на хеш, ref_count = число строк documents с этим хешем
+    op.create_table(
+        "blobs",
+        sa.Column("file_hash", sa.String(64), primary_key=True),
+        sa.Column("path", sa.Text, nullable=False),
+        sa.Column("size_bytes", sa.BigInteger),
+        sa.Column("ref_count", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("created_at", sa.TIMESTAMP, server_default=sa.text("now()")),
+        sa.Column("touched_at", sa.TIMESTAMP, server_default=sa.text("now()")),
+    )
+    op.create_index("ix_blobs_orphans", "blobs", ["touched_at"], postgresql_where=sa.text("ref_count = 0"))
+
+    # Уже загруженные файлы остаются на старых путях, но получают учёт ссылок
+    op.execute("""
+        INSERT INTO blobs (file_hash, path, ref_count)
+        SELECT file_hash, MIN(path), COUNT(*)
+        FROM documents
+        WHERE file_hash IS NOT NULL
+        GROUP BY file_hash
+    """)
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION documents_blob_refcount() RETURNS trigger AS $$
+        BEGIN
+          IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.file_hash IS NOT NULL THEN
+            UPDATE blobs SET ref_count = ref_count - 1, touched_at = now()
+            WHERE file_hash = OLD.file_hash;
+          END IF;
+          IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.file_hash IS NOT NULL THEN
+            UPDATE blobs SET ref_count = ref_count + 1, touched_at = now()
+            WHERE file_hash = NEW.file_hash;
+          END IF;
+          RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER trg_documents_blob_refcount
+        AFTER INSERT OR DELETE OR UPDATE OF file_hash ON documents
+        FOR EACH ROW EXECUTE FUNCTION documents_blob_refcount()
+    """)
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS trg_documents_blob_refcount ON documents")
+    op.execute("DROP FUNCTION IF EXISTS documents_blob_refcount()")
+    op.drop_index("ix_blobs_orphans", table_name="blobs")
+    op.drop_table("blobs")
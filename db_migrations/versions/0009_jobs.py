@@ -0,0 +1,41 @@
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0009_jobs"
+down_revision = "0008_blob_store"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Очередь фоновых задач; воркеры забирают строки через FOR UPDATE SKIP LOCKED
+    op.create_table(
+        "jobs",
+        sa.Column("job_id", sa.BigInteger, primary_key=True, autoincrement=True),
+        sa.Column("kind", sa.Text, nullable=False),
+        sa.Column("payload", postgresql.JSONB, nullable=False, server_default=sa.text("'{}'::jsonb")),
+        sa.Column("status", sa.Text, nullable=False, server_default="queued"),  # queued|running|succeeded|failed
+        sa.Column("attempts", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("max_attempts", sa.Integer, nullable=False, server_default="5"),
+        sa.Column("run_after", sa.TIMESTAMP, nullable=False, server_default=sa.text("now()")),
+        sa.Column("locked_by", sa.Text),
+        sa.Column("locked_at", sa.TIMESTAMP),
+        sa.Column("result", postgresql.JSONB),
+        sa.Column("error", sa.Text),
+        sa.Column("created_at", sa.TIMESTAMP, server_default=sa.text("now()")),
+        sa.Column("updated_at", sa.TIMESTAMP, server_default=sa.text("now()")),
+        sa.Column("finished_at", sa.TIMESTAMP),
+    )
+    op.create_index(
+        "ix_jobs_ready", "jobs", ["run_after", "job_id"],
+        postgresql_where=sa.text("status = 'queued'"),
+    )
+    op.create_index(
+        "ix_jobs_running", "jobs", ["locked_at"],
+        postgresql_where=sa.text("status = 'running'"),
+    )
+
+def downgrade():
+    op.drop_index("ix_jobs_running", table_name="jobs")
+    op.drop_index("ix_jobs_ready", table_name="jobs")
+    op.drop_table("jobs")
@@ -0,0 +1,28 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0010_llm_cache"
+down_revision = "0009_jobs"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Кэш ответов Bedrock: ключ = sha256(model_id, temperature, max_tokens, sha256(prompt))
+    op.create_table(
+        "llm_cache",
+        sa.Column("cache_key", sa.String(64), primary_key=True),
+        sa.Column("model_id", sa.Text, nullable=False),
+        sa.Column("response", sa.Text, nullable=False),
+        sa.Column("prompt_chars", sa.Integer),
+        sa.Column("hit_count", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("created_at", sa.TIMESTAMP, server_default=sa.text("now()")),
+        sa.Column("last_hit_at", sa.TIMESTAMP, server_default=sa.text("now()")),
+        sa.Column("expires_at", sa.TIMESTAMP, nullable=False),
+    )
+    op.create_index("ix_llm_cache_expires", "llm_cache", ["expires_at"])
+    op.create_index("ix_llm_cache_last_hit", "llm_cache", ["last_hit_at"])
+
+def downgrade():
+    op.drop_index("ix_llm_cache_last_hit", table_name="llm_cache")
+    op.drop_index("ix_llm_cache_expires", table_name="llm_cache")
+    op.drop_table("llm_cache")
@@ -0,0 +1,26 @@
+from alembic import op
+
+revision = "0011_doc_course_map_unique"
+down_revision = "0010_llm_cache"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Один курс на документ: оставляем строку с максимальным confidence (при равенстве — самую раннюю)
+    op.execute("""
+        DELETE FROM doc_course_map d
+        USING (
+          SELECT id,
+                 ROW_NUMBER() OVER (
+                   PARTITION BY doc_id, course_id
+                   ORDER BY confidence DESC NULLS LAST, id
+                 ) AS rn
+          FROM doc_course_map
+        ) ranked
+        WHERE d.id = ranked.id AND ranked.rn > 1
+    """)
+    # Нужен для INSERT ... ON CONFLICT (doc_id, course_id) одним запросом на документ
+    op.create_unique_constraint("uq_doc_course_map_doc_course", "doc_course_map", ["doc_id", "course_id"])
+
+def downgrade():
+    op.drop_constraint("uq_doc_course_map_doc_course", "doc_course_map", type_="unique")
@@ -0,0 +1,30 @@
+from alembic import op
+
+revision = "0012_assignments_unique"
+down_revision = "0011_doc_course_map_unique"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Одно назначение на (user_id, course_id): оставляем самое продвинутое по статусу, затем самое раннее
+    op.execute("""
+        DELETE FROM assignments a
+        USING (
+          SELECT assignment_id,
+                 ROW_NUMBER() OVER (
+                   PARTITION BY user_id, course_id
+                   ORDER BY CASE status WHEN 'completed' THEN 0 WHEN 'in_progress' THEN 1 ELSE 2 END,
+                            assignment_id
+                 ) AS rn
+          FROM assignments
+        ) ranked
+        WHERE a.assignment_id = ranked.assignment_id AND ranked.rn > 1
+    """)
+    # ON CONFLICT (user_id, course_id) в create_assignment и рассылке назначений по ролям
+    op.create_unique_constraint("uq_assignments_user_course", "assignments", ["user_id", "course_id"])
+    # рассылка по роли идёт по users.role порциями по user_id
+    op.create_index("ix_users_role_user", "users", ["role", "user_id"])
+
+def downgrade():
+    op.drop_index("ix_users_role_user", table_name="users")
+    op.drop_constraint("uq_assignments_user_course", "assignments", type_="unique")
@@ -0,0 +1,74 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0013_mapping_rules"
+down_revision = "0012_assignments_unique"
+branch_labels = None
+depends_on = None
+
+# Начальные правила = прежний словарь _RULES из app/ai/mappers.py
+_SEED = [
+    (r"\bbloodborne pathogens\b|\b1910\.1030\b", "BBP-1910.1030"),
+    (r"\bhazard communication\b|\bGHS\b|\b1910\.1200\b", "HAZCOM-1910.1200"),
+    (r"\blaboratory safety\b", "LAB-SAFETY-101"),
+    (r"\bchemical spill\b", "CHEM-SPILL-110"),
+    (r"\bPPE\b|\bpersonal protective equipment\b", "PPE-201"),
+    (r"\brespiratory protection\b|\bfit test\b|\b1910\.134\b", "RESPIRATOR-QUAL-130"),
+    (r"\bforklift\b|\bpowered industrial truck(s)?\b|\b1910\.178\b", "FORKLIFT-OP-120"),
+    (r"\blockout/?tagout\b|\b1910\.147\b", "LOTO-1910.147"),
+    (r"\bladder safety\b|\bladders?\b", "LADDER-101"),
+    (r"\bheat illness\b|\b3395\b", "HEAT-ILLNESS-CA-3395"),
+    (r"\bradiation\b|\bALARA\b", "RADIATION-ALARA-101"),
+    (r"\blaser\b|\bclass\s*(2|3R)\b", "LASER-CLASS-2-3R"),
+    (r"\bOSHA[-\s]?10\b", "OSHA-10-GEN"),
+    (r"\bBSL-?1\b|\bbiosafety level 1\b", "BIOSAFETY-BSL1"),
+    (r"\bBSL-?2\b|\bbiosafety level 2\b", "BIOSAFETY-BSL2"),
+    (r"\bfire safety\b|\bfire extinguisher\b", "FIRE-101"),
+    (r"\bergonomics\b", "ERG-101"),
+]
+
+def upgrade():
+    # Правила keyword -> course для regex-маппера; region NULL = для всех регионов
+    rules = op.create_table(
+        "mapping_rules",
+        sa.Column("rule_id", sa.Integer, primary_key=True, autoincrement=True),
+        sa.Column("pattern", sa.Text, nullable=False),
+        sa.Column("course_id", sa.Text, nullable=False),
+        sa.Column("weight", sa.Numeric(4, 2), nullable=False, server_default="1.0"),
+        sa.Column("region", sa.Text),
+        sa.Column("active", sa.Boolean, nullable=False, server_default=sa.text("TRUE")),
+        sa.Column("created_at", sa.TIMESTAMP, server_default=sa.text("now()")),
+        sa.Column("updated_at", sa.TIMESTAMP, server_default=sa.text("now()")),
+    )
+    op.bulk_insert(rules, [{"pattern": p, "course_id": c} for p, c in _SEED])
+
+    # Счётчик версии: воркеры пересобирают скомпилированный матчер только когда он изменился
+    op.create_table(
+        "mapping_rules_version",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("version", sa.BigInteger, nullable=False, server_default="1"),
+        sa.CheckConstraint("id = 1", name="ck_mapping_rules_version_single_row"),
+    )
+    op.execute("INSERT INTO mapping_rules_version (id, version) VALUES (1, 1)")
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION mapping_rules_bump_version() RETURNS trigger AS $$
+        DECLARE v BIGINT;
+        BEGIN
+          UPDATE mapping_rules_version SET version = version + 1 WHERE id = 1 RETURNING version INTO v;
+          PERFORM pg_notify('mapping_rules', v::text);
+          RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER trg_mapping_rules_version
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON mapping_rules
+        FOR EACH STATEMENT EXECUTE FUNCTION mapping_rules_bump_version()
+    """)
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS trg_mapping_rules_version ON mapping_rules")
+    op.execute("DROP FUNCTION IF EXISTS mapping_rules_bump_version()")
+    op.drop_table("mapping_rules_version")
+    op.drop_table("mapping_rules")
@@ -0,0 +1,19 @@
+from alembic import op
+
+revision = "0014_doc_page_search"
+down_revision = "0013_mapping_rules"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Полнотекстовый поиск по страницам: tsvector считается при записи страницы, поиск идёт по GIN
+    op.execute("""
+        ALTER TABLE doc_page_text
+        ADD COLUMN tsv tsvector
+        GENERATED ALWAYS AS (to_tsvector('english', text)) STORED
+    """)
+    op.create_index("ix_doc_page_text_tsv", "doc_page_text", ["tsv"], postgresql_using="gin")
+
+def downgrade():
+    op.drop_index("ix_doc_page_text_tsv", table_name="doc_page_text")
+    op.drop_column("doc_page_text", "tsv")
@@ -0,0 +1,128 @@
+from alembic import op
+
+revision = "0015_user_required_course"
+down_revision = "0014_doc_page_search"
+branch_labels = None
+depends_on = None
+
+# Пересчёт пробелов для прямоугольника пользователи × курсы (NULL = все курсы)
+# из исходных таблиц. Результат не зависит от того, что лежало в таблице раньше,
+# поэтому триггерам достаточно передать надмножество затронутых пар.
+_REFRESH_FN = """
+CREATE OR REPLACE FUNCTION user_required_course_refresh(p_user_ids TEXT[], p_course_ids TEXT[] DEFAULT NULL)
+RETURNS void AS $$
+BEGIN
+  IF p_user_ids IS NULL OR cardinality(p_user_ids) = 0 THEN
+    RETURN;
+  END IF;
+  DELETE FROM user_required_course g
+  WHERE g.user_id = ANY(p_user_ids)
+    AND (p_course_ids IS NULL OR g.course_id = ANY(p_course_ids));
+  INSERT INTO user_required_course (user_id, course_id, region)
+  SELECT DISTINCT u.user_id, rr.course_id, COALESCE(rr.region, '')
+  FROM users u
+  JOIN roles r ON r.name = u.role
+  JOIN rule_requirements rr ON rr.role_id = r.role_id
+  WHERE u.user_id = ANY(p_user_ids)
+    AND (p_course_ids IS NULL OR rr.course_id = ANY(p_course_ids))
+    AND COALESCE(rr.active, TRUE)
+    AND NOT EXISTS (
+      SELECT 1 FROM user_courses uc WHERE uc.user_id = u.user_id AND uc.course_id = rr.course_id
+    );
+END
+$$ LANGUAGE plpgsql
+"""
+
+_REBUILD_FN = """
+CREATE OR REPLACE FUNCTION user_required_course_rebuild() RETURNS BIGINT AS $$
+DECLARE n BIGINT;
+BEGIN
+  LOCK TABLE user_required_course IN EXCLUSIVE MODE;
+  DELETE FROM user_required_course;
+  INSERT INTO user_required_course (user_id, course_id, region)
+  SELECT DISTINCT u.user_id, rr.course_id, COALESCE(rr.region, '')
+  FROM users u
+  JOIN roles r ON r.name = u.role
+  JOIN rule_requirements rr ON rr.role_id = r.role_id
+  WHERE COALESCE(rr.active, TRUE)
+    AND NOT EXISTS (
+      SELECT 1 FROM user_courses uc WHERE uc.user_id = u.user_id AND uc.course_id = rr.course_id
+    );
+  GET DIAGNOSTICS n = ROW_COUNT;
+  RETURN n;
+END
+$$ LANGUAGE plpgsql
+"""
+
+# Триггеры уровня оператора с переходными таблицами: массовая загрузка
+# user_courses или пачка новых правил — один пересчёт на оператор, а не на строку.
+_TRIGGER_FNS = {
+    "user_courses": """
+        PERFORM user_required_course_refresh(
+          ARRAY(SELECT DISTINCT user_id FROM {changed}),
+          ARRAY(SELECT DISTINCT course_id FROM {changed}))
+    """,
+    "users": """
+        PERFORM user_required_course_refresh(ARRAY(SELECT DISTINCT user_id FROM {changed}))
+    """,
+    "rule_requirements": """
+        PERFORM user_required_course_refresh(
+          ARRAY(SELECT u.user_id FROM users u JOIN roles r ON r.name = u.role
+                WHERE r.role_id IN (SELECT role_id FROM {changed})),
+          ARRAY(SELECT DISTINCT course_id FROM {changed}))
+    """,
+    "roles": """
+        PERFORM user_required_course_refresh(
+          ARRAY(SELECT u.user_id FROM users u WHERE u.role IN (SELECT name FROM {changed})))
+    """,
+}
+
+# Переходные таблицы нельзя объявить у триггера на несколько событий — по триггеру на событие
+_EVENTS = {
+    "INSERT": ("REFERENCING NEW TABLE AS new_rows", "new_rows"),
+    "UPDATE": ("REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows",
+               "(SELECT * FROM old_rows UNION ALL SELECT * FROM new_rows)"),
+    "DELETE": ("REFERENCING OLD TABLE AS old_rows", "old_rows"),
+}
+
+def upgrade():
+    # Пробелы в обучении: курсы, которые требуются пользователю по его роли и ещё не пройдены.
+    # region = '' — требование без региона. Рекомендации читают отсюда по user_id.
+    op.execute("""
+        CREATE TABLE user_required_course (
+          user_id   TEXT NOT NULL,
+          course_id TEXT NOT NULL,
+          region    TEXT NOT NULL DEFAULT '',
+          PRIMARY KEY (user_id, region, course_id)
+        )
+    """)
+    op.execute(_REFRESH_FN)
+    op.execute(_REBUILD_FN)
+
+    for table, body in _TRIGGER_FNS.items():
+        for event, (referencing, rows) in _EVENTS.items():
+            fn = f"urc_{table}_{event.lower()}"
+            op.execute(f"""
+                CREATE OR REPLACE FUNCTION {fn}() RETURNS trigger AS $$
+                BEGIN
+                  {body.format(changed=rows + " AS changed").strip()};
+                  RETURN NULL;
+                END
+                $$ LANGUAGE plpgsql
+            """)
+            op.execute(f"""
+                CREATE TRIGGER trg_urc_{event.lower()}
+                AFTER {event} ON {table}
+                {referencing}
+                FOR EACH STATEMENT EXECUTE FUNCTION {fn}()
+            """)
+    op.execute("SELECT user_required_course_rebuild()")
+
+def downgrade():
+    for table in _TRIGGER_FNS:
+        for event in ("insert", "update", "delete"):
+            op.execute(f"DROP TRIGGER IF EXISTS trg_urc_{event} ON {table}")
+            op.execute(f"DROP FUNCTION IF EXISTS urc_{table}_{event}()")
+    op.execute("DROP FUNCTION IF EXISTS user_required_course_rebuild()")
+    op.execute("DROP FUNCTION IF EXISTS user_required_course_refresh(TEXT[], TEXT[])")
+    op.execute("DROP TABLE IF EXISTS user_required_course")
@@ -0,0 +1,29 @@
+from alembic import op
+
+revision = "0016_rule_requirements_notify"
+down_revision = "0015_user_required_course"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Кэш требований по ролям (app/requirements_cache.py) слушает канал
+    # rule_requirements и сбрасывается на любое изменение roles / rule_requirements
+    op.execute("""
+        CREATE OR REPLACE FUNCTION rule_requirements_notify() RETURNS trigger AS $$
+        BEGIN
+          PERFORM pg_notify('rule_requirements', TG_TABLE_NAME);
+          RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    for table in ("rule_requirements", "roles"):
+        op.execute(f"""
+            CREATE TRIGGER trg_{table}_notify
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION rule_requirements_notify()
+        """)
+
+def downgrade():
+    for table in ("rule_requirements", "roles"):
+        op.execute(f"DROP TRIGGER IF EXISTS trg_{table}_notify ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS rule_requirements_notify()")
@@ -0,0 +1,72 @@
+from alembic import op
+
+revision = "0017_urc_refresh_lock"
+down_revision = "0016_rule_requirements_notify"
+branch_labels = None
+depends_on = None
+
+# Два параллельных пересчёта одного пользователя (например, отметка о курсе и
+# смена роли) оба удаляли строки, а потом оба вставляли — второй падал на PK.
+# Пересчёты одного пользователя теперь идут по очереди: advisory-лок до конца
+# транзакции на каждого user_id, берём в одном порядке, чтобы не было дедлоков.
+# ON CONFLICT — на случай строк, вставленных rebuild-ом или другим путём.
+_REFRESH_FN = """
+CREATE OR REPLACE FUNCTION user_required_course_refresh(p_user_ids TEXT[], p_course_ids TEXT[] DEFAULT NULL)
+RETURNS void AS $$
+BEGIN
+  IF p_user_ids IS NULL OR cardinality(p_user_ids) = 0 THEN
+    RETURN;
+  END IF;
+  PERFORM pg_advisory_xact_lock(hashtext('user_required_course'), hashtext(s.user_id))
+  FROM (SELECT DISTINCT unnest(p_user_ids) AS user_id) s
+  ORDER BY hashtext(s.user_id);
+  DELETE FROM user_required_course g
+  WHERE g.user_id = ANY(p_user_ids)
+    AND (p_course_ids IS NULL OR g.course_id = ANY(p_course_ids));
+  INSERT INTO user_required_course (user_id, course_id, region)
+  SELECT DISTINCT u.user_id, rr.course_id, COALESCE(rr.region, '')
+  FROM users u
+  JOIN roles r ON r.name = u.role
+  JOIN rule_requirements rr ON rr.role_id = r.role_id
+  WHERE u.user_id = ANY(p_user_ids)
+    AND (p_course_ids IS NULL OR rr.course_id = ANY(p_course_ids))
+    AND COALESCE(rr.active, TRUE)
+    AND NOT EXISTS (
+      SELECT 1 FROM user_courses uc WHERE uc.user_id = u.user_id AND uc.course_id = rr.course_id
+    )
+  ON CONFLICT (user_id, region, course_id) DO NOTHING;
+END
+$$ LANGUAGE plpgsql
+"""
+
+# Версия из 0015_user_required_course
+_REFRESH_FN_0015 = """
+CREATE OR REPLACE FUNCTION user_required_course_refresh(p_user_ids TEXT[], p_course_ids TEXT[] DEFAULT NULL)
+RETURNS void AS $$
+BEGIN
+  IF p_user_ids IS NULL OR cardinality(p_user_ids) = 0 THEN
+    RETURN;
+  END IF;
+  DELETE FROM user_required_course g
+  WHERE g.user_id = ANY(p_user_ids)
+    AND (p_course_ids IS NULL OR g.course_id = ANY(p_course_ids));
+  INSERT INTO user_required_course (user_id, course_id, region)
+  SELECT DISTINCT u.user_id, rr.course_id, COALESCE(rr.region, '')
+  FROM users u
+  JOIN roles r ON r.name = u.role
+  JOIN rule_requirements rr ON rr.role_id = r.role_id
+  WHERE u.user_id = ANY(p_user_ids)
+    AND (p_course_ids IS NULL OR rr.course_id = ANY(p_course_ids))
+    AND COALESCE(rr.active, TRUE)
+    AND NOT EXISTS (
+      SELECT 1 FROM user_courses uc WHERE uc.user_id = u.user_id AND uc.course_id = rr.course_id
+    );
+END
+$$ LANGUAGE plpgsql
+"""
+
+def upgrade():
+    op.execute(_REFRESH_FN)
+
+def downgrade():
+    op.execute(_REFRESH_FN_0015)
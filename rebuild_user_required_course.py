@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Full rebuild of the user_required_course gap table (required by role,
+not yet completed). Normally the table is kept current by triggers on
+users, roles, rule_requirements and user_courses; run this after bulk
+loads with triggers disabled or if the table is suspected to be stale.
+
+    python3 rebuild_user_required_course.py
+"""
+
+import sys
+import time
+from app.db import get_conn, close_pool
+
+def main():
+    try:
+        t = time.perf_counter()
+        with get_conn() as conn, conn.cursor() as cur:
+            cur.execute("SELECT user_required_course_rebuild() AS rows")
+            rows = cur.fetchone()["rows"]
+        print(f"user_required_course rebuilt: {rows} rows in {time.perf_counter() - t:.2f}s")
+    except Exception as e:
+        print(f"Rebuild failed: {e}")
+        sys.exit(1)
+    finally:
+        close_pool()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Standalone job worker: drains the jobs table (document processing etc.)
+without serving HTTP. Run several copies to process a backlog in parallel.
+
+    JOB_WORKERS=4 python3 run_worker.py
+"""
+
+import signal
+import threading
+import app.routers.documents  # noqa: F401  регистрирует обработчик process_document
+from app.db import close_pool
+from app.jobs import JOB_WORKERS, start_workers, stop_workers
+from app.pdf_text import shutdown_extractor
+
+def main():
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+    start_workers(max(1, JOB_WORKERS))
+    print(f"Job worker running with {max(1, JOB_WORKERS)} threads, Ctrl+C to stop")
+    stop.wait()
+
+    print("Stopping job worker...")
+    stop_workers()
+    shutdown_extractor()
+    close_pool()
+
+if __name__ == "__main__":
+    main()
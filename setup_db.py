@@ -2,7 +2,7 @@
 """Быстрая загрузка демо-данных в БД"""
 import csv
 import os
-from app.db import get_conn
+from app.db import get_conn, close_pool
 
 def load_courses():
     if not os.path.exists("data/courses.csv"):
@@ -56,6 +56,9 @@ def load_users():
 
 if __name__ == "__main__":
     print("📋 Loading demo data...")
-    load_courses()
-    load_users()
+    try:
+        load_courses()
+        load_users()
+    finally:
+        close_pool()
     print("🎉 Demo data ready!")
\ No newline at end of file
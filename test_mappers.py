@@ -0,0 +1,32 @@
+import re
+from app.ai.mappers import BUILTIN_RULES, CompiledMatcher
+
+def _courses(matcher: CompiledMatcher, text: str):
+    return sorted(course_id for course_id, _, _ in matcher.match(text))
+
+def test_overlapping_rules_all_match():
+    # совпадения новых правил перекрываются со встроенными — должны найтись все
+    matcher = CompiledMatcher(BUILTIN_RULES + [
+        (r"\b1910\.134\(c\)", "NEW-COURSE", 1.0),
+        (r"\bfire\b", "FIRE-GEN", 1.0),
+    ])
+    text = "Per 1910.134(c) the employer shall provide a fire extinguisher."
+    assert _courses(matcher, text) == ["FIRE-101", "FIRE-GEN", "NEW-COURSE", "RESPIRATOR-QUAL-130"]
+
+def test_same_counts_as_finditer_per_rule():
+    rules = [(r"ab", "A", 1.0), (r"b", "B", 1.0), (r"a+", "C", 1.0), (r"ba?", "D", 1.0)]
+    text = "aab bab abba"
+    matcher = CompiledMatcher(rules)
+    hits = {}
+    for i, _ in matcher._spans(text):
+        hits[i] = hits.get(i, 0) + 1
+    assert hits == {i: len(re.findall(p, text, re.I)) for i, (p, _, _) in enumerate(rules)}
+
+def test_groups_and_character_classes():
+    matcher = CompiledMatcher([
+        (r"\bfoo\\(bar)", "ESCAPED", 1.0),
+        (r"\bsection[(]c[)]", "CLASS", 1.0),
+        (r"(ab)\1", "BACKREF", 1.0),
+    ])
+    assert _courses(matcher, r"foo\bar, section(c), abab") == ["BACKREF", "CLASS", "ESCAPED"]
+    assert _courses(matcher, "foo(bar, section?c), ab") == []
@@ -3,23 +3,9 @@
 Proof that urgency levels are stored in database
 """
 
-import os
 import requests
 from datetime import date, timedelta
-import psycopg
-from psycopg.rows import dict_row
-
-# Database connection
-def _env_nonempty(name: str) -> str | None:
-    v = os.getenv(name)
-    return v if v and v.strip() else None
-
-DSN = _env_nonempty("DATABASE_DSN") or _env_nonempty("PSQL_URL")
-
-def get_conn():
-    if not DSN:
-        raise RuntimeError("DATABASE_DSN is not set or empty")
-    return psycopg.connect(DSN, row_factory=dict_row)
+from app.db import get_conn, close_pool
 
 def test_database_schema():
     """Test 1: Verify urgency_level column exists in database"""
@@ -215,4 +201,7 @@ def run_all_tests():
     return passed == total
 
 if __name__ == "__main__":
-    run_all_tests()
\ No newline at end of file
+    try:
+        run_all_tests()
+    finally:
+        close_pool()
\ No newline at end of file
@@ -4,22 +4,9 @@ Script to update urgency levels for all assignments.
 Can be run as a cron job or manually.
 """
 
-import os
 import sys
 from datetime import date
-import psycopg
-from psycopg.rows import dict_row
-
-def _env_nonempty(name: str) -> str | None:
-    v = os.getenv(name)
-    return v if v and v.strip() else None
-
-DSN = _env_nonempty("DATABASE_DSN") or _env_nonempty("PSQL_URL")
-
-def get_conn():
-    if not DSN:
-        raise RuntimeError("DATABASE_DSN is not set or empty")
-    return psycopg.connect(DSN, row_factory=dict_row)
+from app.db import get_conn, close_pool
 
 def calculate_urgency_level(due_date: date | None) -> str:
     """Calculate urgency level based on due date"""
@@ -91,5 +78,8 @@ def update_urgency_levels():
         return False
 
 if __name__ == "__main__":
-    success = update_urgency_levels()
+    try:
+        success = update_urgency_levels()
+    finally:
+        close_pool()
     sys.exit(0 if success else 1)
\ No newline at end of file